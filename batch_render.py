@@ -0,0 +1,152 @@
+"""
+Module Description
+==================
+A file that draws the graphs of many paths to image files without a window, for reports. The graphs are made in this
+process, which looks up the names of each graph's nodes all at once, and they are laid out and drawn in parallel by a
+pool of worker processes using Matplotlib's Agg backend.
+
+The images are written to a directory along with manifest.json, which lists the file, path, and names of each image,
+and how many images were drawn per second.
+
+Paths are read from a file, with a path on each line as comma separated ids. The lines of JSON printed by
+python cli.py batch can also be given as they are, so the paths found by a batch of searches can be drawn directly.
+
+Copyright and Usage Information
+===============================
+This file is solely provided for the use in grading and review of the named student's
+work by the TAs and Professors of CSC111. All further distribution of this code whether
+as is or modified is firmly prohibited.
+
+This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING
+import graph_processing as gp
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+# The formats images can be drawn in
+IMAGE_FORMATS = ('png', 'svg', 'pdf')
+
+# The default size of each image in inches, and its resolution in dots per inch
+IMAGE_SIZE = (10.0, 7.0)
+IMAGE_DPI = 100
+
+MANIFEST_NAME = 'manifest.json'
+
+
+def render_paths(database_path: str, paths: list[list[str]], directory: str, image_format: str = 'png',
+                 worker_count: int | None = None, size: tuple[float, float] = IMAGE_SIZE,
+                 dpi: int = IMAGE_DPI) -> dict:
+    """
+    Draw the graph of each path in paths, as make_networkx_graph makes it from the database at database_path, to an
+    image file in directory, creating directory if it doesn't exist. worker_count processes draw the images, or one per
+    CPU if it isn't given. The manifest of the images is written to directory and returned.
+
+    Paths that aren't paths in the graph are listed in the manifest with an error instead of a file.
+
+    Preconditions:
+        - image_format in IMAGE_FORMATS
+        - worker_count is None or worker_count > 0
+    """
+    os.makedirs(directory, exist_ok=True)
+    graph = gp.ShortestActorGraph(database_path, read_only=True)
+    images = []
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(worker_count, initializer=_start_worker) as executor:
+        renders = []
+        for index, path in enumerate(paths):
+            image = {'path': path}
+            images.append(image)
+            try:
+                info = graph.make_networkx_graph(path)
+            except (IndexError, KeyError) as error:
+                image['error'] = f"not a path in the graph ({type(error).__name__})"
+                continue
+
+            image['file'] = f'path_{index:05d}.{image_format}'
+            image['names'] = info.graph['path']
+            image['nodes'] = info.number_of_nodes()
+            renders.append(executor.submit(_render_graph, info, os.path.join(directory, image['file']), size, dpi))
+
+        for render in renders:
+            render.result()
+
+    seconds = time.perf_counter() - start_time
+    rendered = len(renders)
+    manifest = {
+        'database': database_path,
+        'format': image_format,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'images_rendered': rendered,
+        'seconds': seconds,
+        'images_per_second': rendered / seconds if seconds > 0 else 0.0,
+        'images': images
+    }
+    with open(os.path.join(directory, MANIFEST_NAME), 'w', encoding='UTF-8') as file:
+        json.dump(manifest, file, indent=2)
+
+    return manifest
+
+
+def read_paths(file_name: str) -> list[list[str]]:
+    """
+    Return the paths in file_name, which has a path on each line, either as comma separated ids or as a line of JSON
+    with the path under 'path'. Empty paths, such as those of searches that found nothing, are skipped.
+    """
+    paths = []
+    with open(file_name, encoding='UTF-8') as file:
+        for line in file:
+            line = line.strip()
+            if line.startswith('{'):
+                path = json.loads(line).get('path', [])
+            else:
+                path = [node_id for node_id in line.split(',') if node_id != '']
+            if len(path) > 0:
+                paths.append(path)
+    return paths
+
+
+def _start_worker() -> None:
+    """
+    Set up a worker process to draw without a window
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render_graph(info: nx.Graph, output_file: str, size: tuple[float, float], dpi: int) -> None:
+    """
+    Lay out and draw info to output_file. Runs in a worker process.
+    """
+    from matplotlib.figure import Figure
+    import graph_rendering
+
+    figure = Figure(figsize=size, dpi=dpi)
+    graph_rendering.draw_graph(figure.add_axes((0, 0, 1, 1)), info, graph_rendering.layout_graph(info))
+    figure.savefig(output_file)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Draw the graphs of many paths to image files")
+    parser.add_argument('paths', help="a file with a path on each line, as comma separated ids or as JSON lines "
+                                      "printed by python cli.py batch")
+    parser.add_argument('directory', help="the directory to write the images and manifest to")
+    parser.add_argument('--database', default='data_files/actors_and_movies.db', help="the graph database")
+    parser.add_argument('--format', choices=IMAGE_FORMATS, default='png', help="the format of the images")
+    parser.add_argument('--workers', type=int, default=None, help="the number of worker processes")
+    parser.add_argument('--dpi', type=int, default=IMAGE_DPI, help="the resolution of the images")
+    arguments = parser.parse_args()
+
+    result = render_paths(arguments.database, read_paths(arguments.paths), arguments.directory, arguments.format,
+                          arguments.workers, dpi=arguments.dpi)
+    print(f"Drew {result['images_rendered']} images in {result['seconds']:.2f} seconds "
+          f"({result['images_per_second']:.2f} images per second)")
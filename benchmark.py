@@ -0,0 +1,183 @@
+"""
+Module Description
+==================
+A file that times the main steps of the program on synthetic data sets made by synthetic_data, from building the
+databases with sql_processing to searching them and making graphs with graph_processing.
+
+The timings are saved as JSON, so the results of two runs (for example, before and after a change) can be compared.
+Each run records the scale and seed of its data set, so runs are only compared on the same data.
+
+Copyright and Usage Information
+===============================
+This file is solely provided for the use in grading and review of the named student's
+work by the TAs and Professors of CSC111. All further distribution of this code whether
+as is or modified is firmly prohibited.
+
+This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3 as sql
+import statistics
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from typing import Any
+import graph_processing
+import sql_processing
+import synthetic_data
+
+# The number of actor pairs searched between in each benchmark run
+QUERY_COUNT = 50
+
+# The restrictions used when timing get_restricted_path
+RESTRICTIONS = ('Alive', 9999, 1950)
+
+
+def run_benchmarks(title_count: int, seed: int = 0, query_count: int = QUERY_COUNT, directory: str = '') -> dict:
+    """
+    Generate a synthetic data set with title_count titles, then time building the databases from it and running
+    query_count searches between random pairs of actors on it. Returns the results, ready to be saved as JSON.
+
+    The data set and databases are made in directory, which is a temporary directory deleted afterwards if not given.
+
+    Preconditions:
+        - title_count > 0 and query_count > 0
+        - directory == '' or there are no databases in directory yet
+    """
+    if directory == '':
+        with tempfile.TemporaryDirectory() as temporary_directory:
+            return run_benchmarks(title_count, seed, query_count, temporary_directory)
+
+    timings = {}
+    files = synthetic_data.generate_dataset(directory, title_count, seed)
+    main_database = os.path.join(directory, 'all_data.db')
+    graph_database = os.path.join(directory, 'actors_and_movies.db')
+
+    timings['compile_full_data'] = [_time_call(sql_processing.compile_full_data, main_database, *files)[0]]
+
+    sql_processing.create_database(graph_database)
+    sql_processing.create_movie_table(graph_database, main_database, title_count)
+    timings['create_actor_table'] = [_time_call(sql_processing.create_actor_table, graph_database, main_database)[0]]
+    timings['build_graph_database'] = [_time_call(sql_processing.build_graph_database,
+                                                  os.path.join(directory, 'streamed.db'), *files, title_count)[0]]
+
+    graph = graph_processing.ShortestActorGraph(graph_database)
+    with sql.connect(graph_database) as connection:
+        actors = sorted(actor[0] for actor in connection.execute("""SELECT id FROM actor"""))
+        node_count = connection.execute("""SELECT COUNT(*) FROM edge""").fetchone()[0]
+
+    generator = random.Random(seed)
+    pairs = [tuple(generator.sample(actors, 2)) for _ in range(query_count)]
+
+    paths = []
+    timings['get_path'] = []
+    timings['get_restricted_path'] = []
+    for actor1, actor2 in pairs:
+        seconds, path = _time_call(graph.get_path, actor1, actor2)
+        timings['get_path'].append(seconds)
+        paths.append(path)
+        timings['get_restricted_path'].append(_time_call(graph.get_restricted_path, actor1, actor2, *RESTRICTIONS)[0])
+
+    timings['make_networkx_graph'] = [_time_call(graph.make_networkx_graph, path)[0] for path in paths if path != []]
+
+    return {
+        'dataset': {'titles': title_count, 'seed': seed, 'actors': len(actors), 'graph_nodes': node_count},
+        'queries': query_count,
+        'paths_found': sum(1 for path in paths if path != []),
+        'environment': {'python': platform.python_version(), 'sqlite': sql.sqlite_version,
+                        'platform': platform.platform()},
+        'created': datetime.now(timezone.utc).isoformat(),
+        'operations': {operation: summarize(times) for operation, times in timings.items()}
+    }
+
+
+def _time_call(function: Callable, *args: Any) -> tuple[float, Any]:
+    """
+    Return the number of seconds function took to run with args, and what it returned
+    """
+    start_time = time.perf_counter()
+    returned = function(*args)
+    return time.perf_counter() - start_time, returned
+
+
+def summarize(times: list[float]) -> dict[str, float]:
+    """
+    Return the number of calls and summary statistics, in seconds, of the given call times
+
+    >>> summarize([1.0, 2.0, 3.0, 4.0])['median']
+    2.5
+    >>> summarize([])['calls']
+    0
+    """
+    if len(times) == 0:
+        return {'calls': 0}
+
+    sorted_times = sorted(times)
+    return {
+        'calls': len(times),
+        'total': sum(times),
+        'mean': statistics.mean(times),
+        'median': statistics.median(times),
+        'p95': sorted_times[min(len(times) - 1, int(len(times) * 0.95))],
+        'min': sorted_times[0],
+        'max': sorted_times[-1]
+    }
+
+
+def save_results(results: dict, output_file: str) -> None:
+    """
+    Save the results of run_benchmarks to output_file as JSON
+    """
+    with open(output_file, 'w', encoding='UTF-8') as file:
+        json.dump(results, file, indent=2)
+
+
+def compare_results(old_results: dict, new_results: dict) -> dict[str, float]:
+    """
+    Return how many times longer each operation took on average in new_results than in old_results. Operations that
+    only one of the results has are left out.
+
+    Raises a ValueError if the two results weren't run on the same data set.
+    """
+    if old_results['dataset']['titles'] != new_results['dataset']['titles'] \
+            or old_results['dataset']['seed'] != new_results['dataset']['seed']:
+        raise ValueError("The results were run on different data sets")
+
+    ratios = {}
+    for operation, summary in new_results['operations'].items():
+        old_summary = old_results['operations'].get(operation, {'calls': 0})
+        if summary['calls'] > 0 and old_summary['calls'] > 0:
+            ratios[operation] = summary['mean'] / old_summary['mean']
+    return ratios
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    parser = argparse.ArgumentParser(description="Time the program on a synthetic IMDb data set")
+    parser.add_argument('--titles', type=int, default=10000, help="the number of titles in the data set")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the data set and queries")
+    parser.add_argument('--queries', type=int, default=QUERY_COUNT, help="the number of searches to time")
+    parser.add_argument('--directory', default='', help="where to keep the data set, instead of a temporary directory")
+    parser.add_argument('--output', default='benchmark_results.json', help="where to save the results")
+    parser.add_argument('--compare', default='', help="earlier results to compare these results to")
+    arguments = parser.parse_args()
+
+    benchmark_results = run_benchmarks(arguments.titles, arguments.seed, arguments.queries, arguments.directory)
+    save_results(benchmark_results, arguments.output)
+
+    for operation_name, operation_summary in benchmark_results['operations'].items():
+        if operation_summary['calls'] > 0:
+            print(f"{operation_name}: {operation_summary['calls']} calls, "
+                  f"mean {operation_summary['mean'] * 1000:.2f} ms, p95 {operation_summary['p95'] * 1000:.2f} ms")
+
+    if arguments.compare != '':
+        with open(arguments.compare, encoding='UTF-8') as compared_file:
+            for operation_name, ratio in compare_results(json.load(compared_file), benchmark_results).items():
+                print(f"{operation_name}: {ratio:.2f}x the mean time of {arguments.compare}")
@@ -0,0 +1,372 @@
+"""
+Module Description
+==================
+A file with a command line interface to the program, for scripting it without the GUI or the prompts of
+sql_processing. It has the subcommands:
+    - build: Builds the graph database from the downloaded IMDb files
+    - path: Prints the shortest path between two actors
+    - restricted-path: Prints the shortest path between two actors with restrictions on the actors and movies in it
+    - lookup: Prints the id of an actor
+    - batch: Searches for the path between each pair of actors in a file, printing a line of JSON for each
+
+Actors can be given by name or by id. NetworkX and Matplotlib are only imported when a path is drawn with --render,
+and NumPy and SciPy only when --backend sparse is used, so a single query doesn't have to wait for them to load.
+
+Run python cli.py --help, or python main.py with any arguments, for the options of each subcommand.
+
+Copyright and Usage Information
+===============================
+This file is solely provided for the use in grading and review of the named student's
+work by the TAs and Professors of CSC111. All further distribution of this code whether
+as is or modified is firmly prohibited.
+
+This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import sys
+import graph_processing as gp
+import profiling
+import sql_processing
+
+# The exit codes of the command line interface, besides 2, which argparse uses for invalid arguments
+EXIT_FOUND = 0
+EXIT_NOT_FOUND = 1
+EXIT_ERROR = 3
+
+
+class ActorLookupError(Exception):
+    """
+    An error raised when an actor given on the command line can't be identified
+    """
+
+
+def main(arguments: list[str] | None = None) -> int:
+    """
+    Run the command line interface with arguments, or the arguments of the program if not given, and return its exit
+    code. EXIT_NOT_FOUND is returned when a path or actor wasn't found, and EXIT_ERROR when something else went wrong.
+    """
+    parsed = make_parser().parse_args(arguments)
+    if parsed.profile != '':
+        profiling.enable(parsed.profile, parsed.profile_slowest)
+    try:
+        return parsed.run(parsed)
+    except (ActorLookupError, FileNotFoundError, FileExistsError, gp.FileFormatError) as error:
+        print(f"{sys.argv[0]}: error: {str(error) or type(error).__name__}", file=sys.stderr)
+        return EXIT_ERROR
+
+
+def make_parser() -> argparse.ArgumentParser:
+    """
+    Return the parser of the command line interface's arguments. Each subcommand sets run to the function that runs it.
+    """
+    parser = argparse.ArgumentParser(description="Find the shortest paths between actors")
+    parser.add_argument('--profile', default='',
+                        help="a directory to write a profile of each search or step of the build to")
+    parser.add_argument('--profile-slowest', type=float, default=100.0,
+                        help="the percentage of the slowest searches or steps to keep the profiles of")
+    subparsers = parser.add_subparsers(required=True, metavar='command')
+
+    build = subparsers.add_parser('build', help="build the graph database from the downloaded IMDb files")
+    build.add_argument('--database', default=sql_processing.DATABASE_NAME, help="where to make the graph database")
+    build.add_argument('--main-database', default=sql_processing.MAIN_DATABASE,
+                       help="where to make (or find, if it already exists) the database of all the downloaded data")
+    build.add_argument('--actors', default=sql_processing.ID_TO_ACTOR, help="the name.basics.tsv file")
+    build.add_argument('--movies', default=sql_processing.ID_TO_MOVIE, help="the title.basics.tsv file")
+    build.add_argument('--principals', default=sql_processing.MOVIE_TO_ACTOR, help="the title.principals.tsv file")
+    build.add_argument('--movie-count', type=int, default=-1,
+                       help="the number of movies to take from the main database, or every movie if not given")
+    build.add_argument('--streaming', action='store_true',
+                       help="build straight from the downloaded files with a fixed amount of memory, without a main "
+                            "database")
+    build.add_argument('--costar', action='store_true', help="also make the costar table")
+    build.add_argument('--typed', action='store_true',
+                       help="migrate the actor and movie tables to typed, indexed columns")
+    build.add_argument('--optimize', action='store_true', help="optimize the database for the read only serving mode")
+    build.set_defaults(run=run_build)
+
+    lookup = subparsers.add_parser('lookup', help="print the id of an actor")
+    _add_database_arguments(lookup)
+    lookup.add_argument('name', help="the actor's name")
+    lookup.add_argument('--played-in', default='', help="the title of a movie the actor played in")
+    lookup.set_defaults(run=run_lookup)
+
+    path = subparsers.add_parser('path', help="print the shortest path between two actors")
+    _add_search_arguments(path)
+    path.set_defaults(run=run_path, restricted=False)
+
+    restricted_path = subparsers.add_parser('restricted-path', help="print the shortest path between two actors, "
+                                                                    "only going through the actors and movies given")
+    _add_search_arguments(restricted_path)
+    _add_restriction_arguments(restricted_path)
+    restricted_path.set_defaults(run=run_path, restricted=True)
+
+    paths = subparsers.add_parser('paths', help="print the shortest path from one actor to each of several others, "
+                                                "with a single search")
+    _add_database_arguments(paths)
+    _add_limit_arguments(paths)
+    paths.add_argument('actor1', help="the name or id of the actor to start from")
+    paths.add_argument('targets', nargs='+', help="the names or ids of the actors to find")
+    paths.add_argument('--json', action='store_true', help="print the result for each actor as a line of JSON")
+    paths.set_defaults(run=run_paths)
+
+    batch = subparsers.add_parser('batch', help="print the shortest path between each pair of actors in a file, as "
+                                                "a line of JSON each")
+    _add_database_arguments(batch)
+    _add_limit_arguments(batch)
+    batch.add_argument('queries', type=argparse.FileType('r', encoding='UTF-8'),
+                       help="a file (or - for standard input) with a query on each line: two actors, then optionally "
+                            "whether they are alive, and the years movies are released before and after, separated "
+                            "by tabs")
+    batch.set_defaults(run=run_batch)
+
+    return parser
+
+
+def _add_database_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the arguments choosing the graph database and how it is searched to parser
+    """
+    parser.add_argument('--database', default=sql_processing.DATABASE_NAME,
+                        help="the graph database to search, or the manifest of its shards")
+    parser.add_argument('--backend', choices=gp.BACKENDS, default='sqlite',
+                        help="search the edge table in the database, the costar table in the database, or a copy of "
+                             "the edge table in memory")
+    parser.add_argument('--views', default='', help="a directory to keep materialized restricted views in")
+    parser.add_argument('--read-only', action='store_true', help="open the database in the read only serving mode")
+    parser.add_argument('--query-log', default='', help="a file to record every search to, for replay.py")
+    parser.add_argument('--search-threads', type=int, default=1,
+                        help="the number of threads looking up the nodes of each level of a search")
+
+
+def _add_limit_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the arguments limiting searches to parser
+    """
+    parser.add_argument('--timeout', type=float, default=None, help="the number of seconds a search may run for")
+    parser.add_argument('--max-expansions', type=int, default=None, help="the number of nodes a search may expand")
+
+
+def _add_search_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the arguments of the path and restricted-path subcommands to parser
+    """
+    _add_database_arguments(parser)
+    _add_limit_arguments(parser)
+    parser.add_argument('actor1', help="the name or id of the actor to start from")
+    parser.add_argument('actor2', help="the name or id of the actor to find")
+    parser.add_argument('--played-in1', default='', help="the title of a movie the first actor played in")
+    parser.add_argument('--played-in2', default='', help="the title of a movie the second actor played in")
+    parser.add_argument('--json', action='store_true', help="print the result as JSON")
+    parser.add_argument('--render', default='', help="draw the path to this image file")
+
+
+def _add_restriction_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the restrictions of the restricted-path subcommand to parser
+    """
+    parser.add_argument('--alive', choices=['Any', 'Alive', 'Deceased'], default='Any',
+                        help="whether the actors along the path must be alive or deceased")
+    parser.add_argument('--before', type=int, default=9999, help="the year movies must be released before")
+    parser.add_argument('--after', type=int, default=0, help="the year movies must be released after")
+
+
+def open_graph(arguments: argparse.Namespace) -> gp.ShortestActorGraph:
+    """
+    Return the graph chosen by the database arguments
+    """
+    query_log = gp.QueryLog(arguments.query_log) if arguments.query_log != '' else None
+    return gp.open_graph(arguments.database, arguments.backend, arguments.views, arguments.read_only, query_log,
+                         arguments.search_threads)
+
+
+def resolve_actor(graph: gp.ShortestActorGraph, actor: str, played_in: str = '') -> str:
+    """
+    Return the id of actor, which is either an actor's id or name. Raises an ActorLookupError if actor is a name that
+    doesn't belong to exactly one actor.
+    """
+    if re.fullmatch(r'nm\d+', actor) is not None:
+        return actor
+
+    actor_id = graph.get_actor_id(actor, played_in)
+    if actor_id == '':
+        raise ActorLookupError(f"no actor named {actor} was found")
+    elif actor_id == 'tm':
+        raise ActorLookupError(f"there is more than one actor named {actor}, give a movie they played in")
+    return actor_id
+
+
+def run_build(arguments: argparse.Namespace) -> int:
+    """
+    Build the graph database, as the prompts of sql_processing do, or with sql_processing.build_graph_database if
+    streaming
+    """
+    if arguments.streaming or not os.path.exists(arguments.main_database):
+        for file in (arguments.actors, arguments.movies, arguments.principals):
+            if not os.path.exists(file):
+                raise FileNotFoundError(f"{file} doesn't exist")
+
+    if arguments.streaming:
+        if sql_processing.build_graph_database(arguments.database, arguments.actors, arguments.movies,
+                                               arguments.principals, arguments.movie_count) == '':
+            raise FileExistsError(f"{arguments.database} already exists")
+    else:
+        if sql_processing.compile_full_data(arguments.main_database, arguments.actors, arguments.movies,
+                                            arguments.principals) != '':
+            print(f"Made a main database at {arguments.main_database}")
+
+        if sql_processing.create_database(arguments.database) == '':
+            raise FileExistsError(f"{arguments.database} already exists")
+        sql_processing.create_movie_table(arguments.database, arguments.main_database, arguments.movie_count)
+        sql_processing.create_actor_table(arguments.database, arguments.main_database)
+    if arguments.costar:
+        sql_processing.create_costar_table(arguments.database)
+    if arguments.typed:
+        sql_processing.migrate_typed_schema(arguments.database)
+    if arguments.optimize:
+        sql_processing.optimize_for_serving(arguments.database)
+
+    print(f"Made a graph database at {arguments.database}")
+    return EXIT_FOUND
+
+
+def run_lookup(arguments: argparse.Namespace) -> int:
+    """
+    Print the id of the actor with the given name
+    """
+    graph = open_graph(arguments)
+    try:
+        print(resolve_actor(graph, arguments.name, arguments.played_in))
+        return EXIT_FOUND
+    finally:
+        graph.close()
+
+
+def run_path(arguments: argparse.Namespace) -> int:
+    """
+    Print the shortest path, restricted or not, between two actors, and draw it if asked to
+    """
+    graph = open_graph(arguments)
+    try:
+        actor1 = resolve_actor(graph, arguments.actor1, arguments.played_in1)
+        actor2 = resolve_actor(graph, arguments.actor2, arguments.played_in2)
+        limits = gp.SearchLimits(arguments.max_expansions, arguments.timeout)
+
+        if arguments.restricted:
+            result = graph.find_restricted_path(actor1, actor2, arguments.alive, arguments.before, arguments.after,
+                                                limits)
+        else:
+            result = graph.find_path(actor1, actor2, limits)
+
+        description = graph.describe_result(result)
+        if arguments.json:
+            print(json.dumps(description))
+        elif description['status'] == gp.FOUND:
+            print(' -> '.join(description['names']))
+        elif description['status'] == gp.CUT_OFF:
+            print(f"Gave up on the search ({result.cut_off_reason}) after visiting {result.stats.visited} nodes")
+        else:
+            print("No connection found")
+
+        if arguments.render != '' and description['status'] == gp.FOUND:
+            render_path(graph, description['path'], arguments.render)
+
+        return EXIT_FOUND if description['status'] == gp.FOUND else EXIT_NOT_FOUND
+    finally:
+        graph.close()
+
+
+def run_paths(arguments: argparse.Namespace) -> int:
+    """
+    Print the shortest path from one actor to each of the target actors, found with a single search
+    """
+    graph = open_graph(arguments)
+    try:
+        actor1 = resolve_actor(graph, arguments.actor1)
+        targets = [resolve_actor(graph, target) for target in arguments.targets]
+        results = graph.find_paths(actor1, targets, gp.SearchLimits(arguments.max_expansions, arguments.timeout))
+
+        all_found = True
+        for target in targets:
+            description = graph.describe_result(results[target])
+            all_found = all_found and description['status'] == gp.FOUND
+            if arguments.json:
+                print(json.dumps({'actor1': actor1, 'actor2': target, **description}))
+            elif description['status'] == gp.FOUND:
+                print(' -> '.join(description['names']))
+            elif description['status'] == gp.CUT_OFF:
+                print(f"Gave up on the search for {target} ({description['cut_off_reason']})")
+            else:
+                print(f"No connection found to {target}")
+
+        return EXIT_FOUND if all_found else EXIT_NOT_FOUND
+    finally:
+        graph.close()
+
+
+def run_batch(arguments: argparse.Namespace) -> int:
+    """
+    Print the shortest path between each pair of actors in the queries file as a line of JSON. Queries that can't be
+    read are reported with an error instead of a result.
+    """
+    graph = open_graph(arguments)
+    try:
+        all_found = True
+        for line_number, line in enumerate(arguments.queries, 1):
+            if line.strip() == '':
+                continue
+            record = {'line': line_number}
+            try:
+                record.update(run_query(graph, line.rstrip('\n').split('\t'), arguments))
+                all_found = all_found and record['status'] == gp.FOUND
+            except (ActorLookupError, ValueError) as error:
+                record['error'] = str(error)
+                all_found = False
+            print(json.dumps(record), flush=True)
+
+        return EXIT_FOUND if all_found else EXIT_NOT_FOUND
+    finally:
+        graph.close()
+
+
+def run_query(graph: gp.ShortestActorGraph, fields: list[str], arguments: argparse.Namespace) -> dict:
+    """
+    Search for the path described by fields, a line of a batch file split on tabs, and return a description of the
+    result. Raises a ValueError if fields don't describe a search.
+    """
+    if not 2 <= len(fields) <= 5:
+        raise ValueError("expected two actors, then at most three restrictions")
+    actor1, actor2 = resolve_actor(graph, fields[0]), resolve_actor(graph, fields[1])
+    limits = gp.SearchLimits(arguments.max_expansions, arguments.timeout)
+
+    if len(fields) == 2:
+        result = graph.find_path(actor1, actor2, limits)
+    else:
+        alive = fields[2] or 'Any'
+        if alive.lower() not in ('any', 'alive', 'deceased'):
+            raise ValueError("whether the actors are alive must be Any, Alive, or Deceased")
+        before = int(fields[3]) if len(fields) > 3 and fields[3] != '' else 9999
+        after = int(fields[4]) if len(fields) > 4 and fields[4] != '' else 0
+        result = graph.find_restricted_path(actor1, actor2, alive, before, after, limits)
+
+    return {'actor1': actor1, 'actor2': actor2, **graph.describe_result(result)}
+
+
+def render_path(graph: gp.ShortestActorGraph, path: list[str], output_file: str) -> None:
+    """
+    Draw the graph of path that the GUI would show to output_file, in a format chosen by its extension
+    """
+    from matplotlib.figure import Figure
+    import graph_rendering
+
+    info = graph.make_networkx_graph(path)
+    figure = Figure(figsize=(10, 7), dpi=100)
+    graph_rendering.draw_graph(figure.add_axes((0, 0, 1, 1)), info, graph_rendering.layout_graph(info))
+    figure.savefig(output_file)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -14,10 +14,23 @@ as is or modified is firmly prohibited.
 
 This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
 """
+from __future__ import annotations
 import os
+import json
+import logging
+import time
+import threading
 import sqlite3 as sql
-from collections import deque
-import networkx as nx
+from pathlib import Path
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, TextIO
+import profiling
+import sql_processing
+
+if TYPE_CHECKING:
+    import networkx as nx
 
 ID_TO_ACTOR = 'data_files/name.basics.tsv'
 ID_TO_MOVIE = 'data_files/title.basics.tsv'
@@ -26,6 +39,30 @@ MOVIE_TO_ACTOR = 'data_files/title.principals.tsv'
 # The number of nodes to add to each node in a path for context
 RANDOM_NODE_COUNT = 3
 
+# The largest number of ids looked up in one query, under SQLite's limit on the number of parameters
+LOOKUP_BATCH_SIZE = 500
+
+# The fewest ids each thread looks up when the nodes of a search are looked up by several threads
+PARALLEL_CHUNK_SIZE = 64
+
+# The default number of bytes the materialized restricted views of a graph may take up on disk together
+VIEW_BUDGET = 512 * 1024 * 1024
+
+# The default number of bytes of a database memory mapped, and of its pages cached, by each read only connection
+MMAP_SIZE = 1024 * 1024 * 1024
+CACHE_SIZE = 64 * 1024 * 1024
+
+# The ways a graph database can be searched: its edge table, its costar table, or a copy of its edge table in memory
+BACKENDS = ('sqlite', 'costar', 'sparse')
+
+# The possible statuses of a SearchResult
+FOUND = 'found'
+NOT_FOUND = 'not found'
+CUT_OFF = 'cut off'
+
+# The logger every search is recorded to, as a JSON record at the INFO level
+LOGGER = logging.getLogger(__name__)
+
 
 class FileFormatError(Exception):
     """
@@ -39,6 +76,401 @@ class FileFormatError(Exception):
         return "The file attempted to be read is not in the correct format"
 
 
+class RestrictedViewCache:
+    """
+    A collection of materialized restricted views of a graph database. A view is a separate database file with an edge
+    table already pruned down to the nodes matching one set of restrictions, so a restricted search on it is a plain
+    breadth first search.
+
+    A view is built the first time its restrictions are requested. Whenever the views take up more than the budget
+    in disk space together, the least recently used views are deleted.
+    """
+
+    # Private Instance Attributes:
+    #   - _db_path: The file path leading to the graph database the views are made from
+    #   - _directory: The directory the view databases are stored in
+    #   - _budget: The number of bytes all the views in _directory may take up together
+    #   - _last_used: A mapping from the path of each view used by this cache to when it was last used
+    #   - _local: Holds the number of views requested by this thread that didn't have to be built, named hits
+    #   - _view_locks: A mapping from the path of each view requested to the lock held while it is checked or built, so
+    #                  threads requesting a view that doesn't exist yet build it once
+    #   - _lock: Held while _view_locks, _last_used, or hits are changed, or views are deleted to fit the budget
+
+    # Instance Attributes:
+    #   - hits: The number of times a view was requested and didn't have to be built
+
+    _db_path: str
+    _directory: str
+    _budget: int
+    _last_used: dict[str, float]
+    _local: threading.local
+    _view_locks: dict[str, threading.Lock]
+    _lock: threading.Lock
+    hits: int
+
+    def __init__(self, database_path: str, directory: str, budget: int = VIEW_BUDGET) -> None:
+        """
+        Initializes the cache, creating the directory for the views if it doesn't exist yet
+
+        Preconditions:
+            - database_path refers to a valid sqlite3 database that has at least the tables "actor", "movie", and "edge"
+            - budget >= 0
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._db_path = database_path
+        self._directory = directory
+        self._budget = budget
+        self._last_used = {}
+        self._local = threading.local()
+        self._view_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    @staticmethod
+    def view_name(want_alive: str, released_before: int, released_after: int) -> str:
+        """
+        Return the file name of the view for the given restrictions. Restrictions that match_requirements treats the
+        same are given the same name.
+
+        >>> RestrictedViewCache.view_name('Alive', 9999, 1990)
+        'edge_alive_1990_9999.db'
+        >>> RestrictedViewCache.view_name('Deceased', 9999, 0) == RestrictedViewCache.view_name('dead', 9999, 0)
+        True
+        """
+        if want_alive.lower() in ('any', 'alive'):
+            alive_state = want_alive.lower()
+        else:
+            alive_state = 'deceased'
+        return f'edge_{alive_state}_{released_after}_{released_before}.db'
+
+    def get_view(self, want_alive: str, released_before: int, released_after: int) -> str:
+        """
+        Return the file path of the view for the given restrictions, building it first if it doesn't exist or is older
+        than the graph database. Threads requesting the same view at once wait for a single build of it.
+        """
+        view_path = os.path.join(self._directory, self.view_name(want_alive, released_before, released_after))
+        with self._lock:
+            view_lock = self._view_locks.setdefault(view_path, threading.Lock())
+
+        with view_lock:
+            if os.path.exists(view_path) and os.path.getmtime(view_path) < os.path.getmtime(self._db_path):
+                os.remove(view_path)
+
+            built = not os.path.exists(view_path)
+            if built:
+                sql_processing.create_restricted_edge_table(view_path, self._db_path, want_alive,
+                                                            released_before, released_after)
+
+        with self._lock:
+            if not built:
+                self.hits += 1
+                self._local.hits = self.thread_hits() + 1
+            self._last_used[view_path] = time.time()
+            self._enforce_budget(view_path)
+        return view_path
+
+    def thread_hits(self) -> int:
+        """
+        Return the number of times a view was requested by this thread and didn't have to be built
+        """
+        return getattr(self._local, 'hits', 0)
+
+    def _enforce_budget(self, keep: str) -> None:
+        """
+        Delete the least recently used views until all the views fit in the budget. The view at keep is never deleted.
+
+        Views this cache hasn't used are considered to be used when they were built.
+        """
+        views = [os.path.join(self._directory, file_name) for file_name in os.listdir(self._directory)
+                 if file_name.startswith('edge_') and file_name.endswith('.db')]
+        total_size = sum(os.path.getsize(view) for view in views)
+
+        views.sort(key=lambda view: self._last_used.get(view, os.path.getmtime(view)))
+
+        for view in views:
+            if total_size <= self._budget:
+                return
+            if view != keep:
+                total_size -= os.path.getsize(view)
+                os.remove(view)
+                self._last_used.pop(view, None)
+
+
+class ShardRouter:
+    """
+    Sends lookups of ids to the shards of a graph database split by sql_processing.shard_database.
+
+    Instance Attributes:
+        - paths: The file path of each shard, in order
+    """
+    paths: list[str]
+
+    # Private Instance Attributes:
+    #   - _boundaries: The boundaries of the shards if they were split by range, or an empty list if split by hash
+
+    _boundaries: list[int]
+
+    def __init__(self, manifest_path: str) -> None:
+        """
+        Initializes the router from the manifest of the shards at manifest_path
+        """
+        with open(manifest_path, encoding='UTF-8') as file:
+            manifest = json.load(file)
+
+        directory = os.path.dirname(manifest_path)
+        self.paths = [os.path.join(directory, shard_file) for shard_file in manifest['shards']]
+        self._boundaries = manifest['boundaries']
+
+    def database_for(self, object_id: str) -> str:
+        """
+        Return the file path of the shard holding object_id
+        """
+        return self.paths[sql_processing.shard_index(object_id, len(self.paths), self._boundaries)]
+
+    def group(self, object_ids: list[str]) -> dict[str, list[str]]:
+        """
+        Return a mapping from the file path of each shard to the ids in object_ids it holds. Shards holding none of them
+        are left out.
+        """
+        groups = {}
+        for object_id in object_ids:
+            groups.setdefault(self.database_for(object_id), []).append(object_id)
+        return groups
+
+
+class CancellationToken:
+    """
+    A flag shared between a search and whoever started it. Once cancelled, any search given this token stops before it
+    expands its next node. A token can be cancelled from any thread.
+    """
+
+    # Private Instance Attributes:
+    #   - _cancelled: Set once the token has been cancelled
+
+    _cancelled: threading.Event
+
+    def __init__(self) -> None:
+        """
+        Initializes a token that has not been cancelled
+        """
+        self._cancelled = threading.Event()
+
+    def cancel(self) -> None:
+        """
+        Cancel every search using this token
+        """
+        self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        """
+        Return whether this token has been cancelled
+        """
+        return self._cancelled.is_set()
+
+
+class SearchLimits:
+    """
+    The limits a search must stay within. A search going past any of them is cut off.
+
+    Instance Attributes:
+        - max_expansions: The number of nodes the search may expand, or None if there is no limit
+        - deadline: The time.monotonic() time by which the search must finish, or None if there is no limit
+        - token: A token that cancels the search, or None if the search can't be cancelled
+        - on_progress: Called by the search with its depth and the number of nodes it has visited as it starts each
+          level, or None if nobody is following its progress. It is called on the thread running the search.
+
+    Representation Invariants:
+        - self.max_expansions is None or self.max_expansions >= 0
+    """
+    max_expansions: int | None
+    deadline: float | None
+    token: CancellationToken | None
+    on_progress: Callable[[int, int], None] | None
+
+    def __init__(self, max_expansions: int | None = None, timeout: float | None = None,
+                 token: CancellationToken | None = None,
+                 on_progress: Callable[[int, int], None] | None = None) -> None:
+        """
+        Initializes the limits, with the deadline timeout seconds from now
+        """
+        self.max_expansions = max_expansions
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.token = token
+        self.on_progress = on_progress
+
+    def report_progress(self, depth: int, visited: int) -> None:
+        """
+        Tell on_progress, if there is one, that a search has started its level at depth having visited visited nodes
+        """
+        if self.on_progress is not None:
+            self.on_progress(depth, visited)
+
+    def cut_off_reason(self, nodes_expanded: int) -> str:
+        """
+        Return why a search that has expanded nodes_expanded nodes should be cut off before expanding another. Returns
+        an empty string if the search may go on.
+
+        >>> SearchLimits(max_expansions=10).cut_off_reason(10)
+        'budget'
+        >>> SearchLimits(max_expansions=10, timeout=60).cut_off_reason(9)
+        ''
+        """
+        if self.token is not None and self.token.is_cancelled():
+            return 'cancelled'
+        elif self.max_expansions is not None and nodes_expanded >= self.max_expansions:
+            return 'budget'
+        elif self.deadline is not None and time.monotonic() >= self.deadline:
+            return 'deadline'
+        else:
+            return ''
+
+
+class SearchStats:
+    """
+    Statistics on what a query cost, from the progress its search made to the database work it took. A query can add
+    to the same statistics from several steps, such as looking up the actors' ids, searching, and making the graph.
+
+    Instance Attributes:
+        - nodes_expanded: The number of nodes whose adjacent nodes were looked up
+        - neighbours_scanned: The number of adjacent nodes looked at, over all expanded nodes
+        - depth: The number of levels of the search that were started
+        - peak_frontier: The largest number of nodes in one level of the search
+        - visited: The number of nodes reached by the search. The search never forgets a node, so this is also the
+          largest its visited set got.
+        - sql_queries: The number of SQL statements run
+        - connections_opened: The number of database connections opened
+        - cache_hits: The number of times a cached result (such as a materialized view) was used
+        - search_time: The number of seconds spent searching
+        - name_time: The number of seconds spent looking up names and ids
+        - layout_time: The number of seconds spent laying out the graph of the path
+    """
+    nodes_expanded: int
+    neighbours_scanned: int
+    depth: int
+    peak_frontier: int
+    visited: int
+    sql_queries: int
+    connections_opened: int
+    cache_hits: int
+    search_time: float
+    name_time: float
+    layout_time: float
+
+    def __init__(self) -> None:
+        """
+        Initializes the statistics of a search that hasn't started yet, with every count and time at zero
+        """
+        self.nodes_expanded = 0
+        self.neighbours_scanned = 0
+        self.depth = 0
+        self.peak_frontier = 0
+        self.visited = 0
+        self.sql_queries = 0
+        self.connections_opened = 0
+        self.cache_hits = 0
+        self.search_time = 0.0
+        self.name_time = 0.0
+        self.layout_time = 0.0
+
+    def as_dict(self) -> dict[str, int | float]:
+        """
+        Return these statistics as a dictionary from their names to their values
+
+        >>> SearchStats().as_dict()['nodes_expanded']
+        0
+        """
+        return dict(vars(self))
+
+    def add(self, other: SearchStats) -> None:
+        """
+        Add the work recorded in other to these statistics. The depth, peak frontier, and visited count are the largest
+        of the two, as they describe a single search rather than work adding up.
+        """
+        for name, value in vars(other).items():
+            if name in ('depth', 'peak_frontier', 'visited'):
+                setattr(self, name, max(getattr(self, name), value))
+            else:
+                setattr(self, name, getattr(self, name) + value)
+
+
+class SearchResult:
+    """
+    The result of a search for the shortest path between two actors.
+
+    Instance Attributes:
+        - status: FOUND if a path was found, NOT_FOUND if there is no such path, or CUT_OFF if the search was stopped
+          before it could tell
+        - path: The path found, or an empty list if the status is not FOUND
+        - stats: The statistics of the search
+        - cut_off_reason: 'budget', 'deadline', or 'cancelled' depending on the limit that cut off the search, or an
+          empty string if it wasn't cut off
+
+    Representation Invariants:
+        - self.status in {FOUND, NOT_FOUND, CUT_OFF}
+        - (self.status == FOUND) == (self.path != [])
+        - (self.status == CUT_OFF) == (self.cut_off_reason != '')
+    """
+    status: str
+    path: list[str]
+    stats: SearchStats
+    cut_off_reason: str
+
+    def __init__(self, status: str, path: list[str], stats: SearchStats, cut_off_reason: str = '') -> None:
+        """
+        Initializes the result of a search that ended with status, finding path, with the statistics in stats
+        """
+        self.status = status
+        self.path = path
+        self.stats = stats
+        self.cut_off_reason = cut_off_reason
+
+
+class QueryLog:
+    """
+    An append only log of the searches run on graphs, as a file with a line of JSON for each search. It can be shared
+    by several graphs and threads at once. See replay.py for running the searches of a log again.
+
+    Each line has the time the search finished, the endpoint searched ('path', 'restricted_path', or 'paths'), actor1,
+    the targets searched for, the restrictions of a restricted search, the seconds the search took, the status and
+    path length found for each target, and the backend searched.
+
+    Instance Attributes:
+        - file_name: The path of the log file
+    """
+    file_name: str
+
+    # Private Instance Attributes:
+    #   - _file: The log file, open for appending
+    #   - _lock: Held while a line is written to _file
+
+    _file: TextIO
+    _lock: threading.Lock
+
+    def __init__(self, file_name: str) -> None:
+        """
+        Initializes the log, creating the file at file_name if it doesn't exist, and appending to it if it does
+        """
+        self.file_name = file_name
+        self._file = open(file_name, 'a', encoding='UTF-8')
+        self._lock = threading.Lock()
+
+    def record(self, entry: dict) -> None:
+        """
+        Append entry to the log as a line of JSON
+        """
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self) -> None:
+        """
+        Close the log file
+        """
+        with self._lock:
+            self._file.close()
+
+
 class ShortestActorGraph:
     """
     A class with the graph which will process the functions such as shortest_path or new_bacon
@@ -46,80 +478,356 @@ class ShortestActorGraph:
 
     # Private Instance Attributes:
     #   - _db_path: The file path leading to the formatted
+    #   - _views: The materialized restricted views used by get_restricted_path, or None if restricted searches filter
+    #             the full graph as they go
+    #   - _use_costar: Whether unrestricted searches go through the costar table instead of the edge table
+    #   - _read_only: Whether the databases are opened in the read only serving mode, with one connection per thread
+    #   - _mmap_size: The number of bytes of a database memory mapped by each read only connection
+    #   - _cache_size: The number of bytes of a database's pages cached by each read only connection
+    #   - _local: Holds the work this thread has done for this graph, in a mapping named counts from sql_queries,
+    #             connections_opened, and cache_hits to the number of SQL statements run, database connections opened,
+    #             and cached results used (not counting materialized views)
+    #   - _connections: Holds the read only connections of this thread, in a mapping from database paths named
+    #                   connections
+    #   - _open_connections: Every read only connection opened by any thread that hasn't been closed yet
+    #   - _shards: The router to the shards of the graph database, or None if it is a single database
+    #   - _query_log: The log every search is recorded to, or None if searches aren't recorded
+    #   - _search_threads: The number of threads the nodes of each level of a search are looked up by
+    #   - _search_pool: The pool of threads looking up the nodes of searches, or None if it hasn't been started
+    #   - _pool_lock: Held while _search_pool is started or stopped, or _open_connections is changed
 
     _db_path: str
-
-    def __init__(self, database_path: str) -> None:
+    _views: RestrictedViewCache | None
+    _use_costar: bool
+    _read_only: bool
+    _mmap_size: int
+    _cache_size: int
+    _local: threading.local
+    _connections: threading.local
+    _open_connections: list[sql.Connection]
+    _shards: ShardRouter | None
+    _query_log: QueryLog | None
+    _search_threads: int
+    _search_pool: ThreadPoolExecutor | None
+    _pool_lock: threading.Lock
+
+    def __init__(self, database_path: str, view_directory: str = '', view_budget: int = VIEW_BUDGET,
+                 use_costar: bool = False, read_only: bool = False, mmap_size: int = MMAP_SIZE,
+                 cache_size: int = CACHE_SIZE, query_log: QueryLog | None = None, search_threads: int = 1) -> None:
         """
         Initializes the _actors and _movies attributes using the files
 
+        If view_directory is given, restricted searches are run on materialized views stored in that directory, which
+        may take up at most view_budget bytes together. See RestrictedViewCache.
+
+        If use_costar is True, unrestricted searches only visit actors, using the costar table made by
+        sql_processing.create_costar_table. A FileFormatError is raised if the database has no such table.
+
+        If read_only is True, the databases are opened in a read only serving mode. Each thread keeps one connection to
+        each database open, which treats the file as immutable, memory maps up to mmap_size bytes of it, caches up to
+        cache_size bytes of its pages, and refuses to write. The files must not be changed while this graph is in use.
+        See sql_processing.optimize_for_serving for preparing a database for this mode.
+
+        database_path may also be the manifest of a sharded graph database, made by sql_processing.shard_database, which
+        is recognized by its .json extension. Each id is then looked up in the shard holding it, and the ids of each
+        level of a search are looked up together, with a query per shard. Materialized views aren't made from sharded
+        databases, so a FileFormatError is raised if view_directory is given with one.
+
+        If query_log is given, every search run on this graph is recorded to it.
+
+        If search_threads is more than 1, the nodes of each level of a search on the edge table are looked up by a pool
+        of that many threads, as get_adjacent_nodes_parallel does. This is best used in read only mode, where each
+        thread keeps its own connection.
+
         Preconditions:
             - database_path refers to a valid sqlite3 database that has at least the tables "actor", "movie", and "edge"
                 - It will throw an error if this is not true
+            - view_budget >= 0
+            - search_threads > 0
         """
         if not os.path.exists(database_path):
             raise FileNotFoundError
         self._db_path = database_path
+        self._use_costar = use_costar
+        self._read_only = read_only
+        self._mmap_size = mmap_size
+        self._cache_size = cache_size
+        self._local = threading.local()
+        self._connections = threading.local()
+        self._open_connections = []
+        self._shards = ShardRouter(database_path) if database_path.endswith('.json') else None
+        self._query_log = query_log
+        self._search_threads = search_threads
+        self._search_pool = None
+        self._pool_lock = threading.Lock()
+
+        if use_costar:
+            for database in self._databases():
+                with self._connect(database) as connection:
+                    costar_table = connection.execute("""
+                        SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'costar'
+                        """).fetchone()
+                if costar_table is None:
+                    raise FileFormatError
+
+        if view_directory == '':
+            self._views = None
+        elif self._shards is not None:
+            raise FileFormatError
+        else:
+            self._views = RestrictedViewCache(database_path, view_directory, view_budget)
+
+    @contextmanager
+    def _connect(self, database_path: str = '') -> Iterator[sql.Connection]:
+        """
+        Run the with block with a connection to the database at database_path, or to the graph database if it isn't
+        given. The connections opened and every statement run on them are counted by the thread that opened and ran
+        them.
+
+        In read only mode, this thread's open connection to the database is used, opening it first if needed, and is
+        left open for the next with block until the graph is closed. Otherwise a new connection is opened, and closed
+        when the with block ends, after committing its changes, or rolling them back if the block raised an error.
+        """
+        if database_path == '':
+            database_path = self._db_path
+
+        if self._read_only:
+            yield self._read_only_connection(database_path)
+            return
+
+        connection = sql.connect(database_path)
+        connection.set_trace_callback(self._count_statement)
+        self._thread_counts()['connections_opened'] += 1
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _read_only_connection(self, database_path: str) -> sql.Connection:
+        """
+        Return this thread's read only connection to the database at database_path, opening it if it isn't open yet
+        """
+        if not hasattr(self._connections, 'connections'):
+            self._connections.connections = {}
+        if database_path in self._connections.connections:
+            return self._connections.connections[database_path]
+
+        # The connection may be closed by close on another thread, but is only ever used by this one
+        connection = sql.connect(Path(database_path).resolve().as_uri() + '?mode=ro&immutable=1', uri=True,
+                                 check_same_thread=False)
+        connection.execute(f"""PRAGMA mmap_size = {int(self._mmap_size)}""")
+        connection.execute(f"""PRAGMA cache_size = {-int(self._cache_size) // 1024}""")
+        connection.execute("""PRAGMA query_only = ON""")
+        connection.set_trace_callback(self._count_statement)
+        self._thread_counts()['connections_opened'] += 1
+
+        self._connections.connections[database_path] = connection
+        with self._pool_lock:
+            self._open_connections.append(connection)
+        return connection
+
+    def _count_statement(self, statement: str) -> None:
+        """
+        Count an SQL statement run on one of this graph's connections, and record it in the stage being profiled, if
+        there is one
+        """
+        self._thread_counts()['sql_queries'] += 1
+        profiling.record_statement(statement)
+
+    def _thread_counts(self) -> dict[str, int]:
+        """
+        Return the counts of the work this thread has done for this graph. Since each thread has its own counts, the
+        searches running at the same time on other threads aren't counted in them.
+        """
+        if not hasattr(self._local, 'counts'):
+            self._local.counts = {'sql_queries': 0, 'connections_opened': 0, 'cache_hits': 0}
+        return self._local.counts
+
+    def _database_for(self, object_id: str) -> str:
+        """
+        Return the file path of the database holding object_id, which is its shard if the graph database is sharded
+        """
+        return self._db_path if self._shards is None else self._shards.database_for(object_id)
+
+    def _databases(self) -> list[str]:
+        """
+        Return the file paths of every database the graph is stored in, which is every shard if it is sharded
+        """
+        return [self._db_path] if self._shards is None else self._shards.paths
 
-    def make_networkx_graph(self, path: list[str]) -> nx.Graph:
+    def _lookup(self, table: str, key_column: str, value_column: str, keys: list[str],
+                database_path: str = '') -> dict[str, str]:
+        """
+        Return a mapping from each of keys to its value_column in table, where its key_column is the key. The keys are
+        looked up LOOKUP_BATCH_SIZE at a time in the database at database_path, or, if it isn't given, in the database
+        holding each key. Keys that aren't in the table are left out.
+        """
+        if len(keys) == 0:
+            return {}
+        elif database_path != '':
+            groups = {database_path: list(keys)}
+        elif self._shards is None:
+            groups = {self._db_path: list(keys)}
+        else:
+            groups = self._shards.group(keys)
+
+        values = {}
+        for database, group in groups.items():
+            with self._connect(database) as connection:
+                cursor = connection.cursor()
+                for start in range(0, len(group), LOOKUP_BATCH_SIZE):
+                    batch = group[start:start + LOOKUP_BATCH_SIZE]
+                    values.update(cursor.execute(f"""
+                        SELECT {key_column}, {value_column} FROM {table}
+                        WHERE {key_column} IN ({', '.join('?' * len(batch))})
+                        """, batch))
+                cursor.close()
+
+        return values
+
+    def _count_cache_hits(self) -> int:
+        """
+        Return the number of times this thread has used a cached result of this graph, including its materialized views
+        """
+        return self._thread_counts()['cache_hits'] + (0 if self._views is None else self._views.thread_hits())
+
+    @contextmanager
+    def _tracked(self, stats: SearchStats | None, timer: str) -> Iterator[None]:
+        """
+        Add the SQL statements, connections, cache hits, and time taken within the with block to stats. The time is
+        added to the attribute of stats named timer. Nothing is recorded if stats is None.
+
+        Only the work of this thread is added, so searches running at the same time on other threads don't add to each
+        other's statistics.
+        """
+        counts = self._thread_counts()
+        sql_queries = counts['sql_queries']
+        connections_opened = counts['connections_opened']
+        cache_hits = self._count_cache_hits()
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            if stats is not None:
+                setattr(stats, timer, getattr(stats, timer) + time.perf_counter() - start_time)
+                stats.sql_queries += counts['sql_queries'] - sql_queries
+                stats.connections_opened += counts['connections_opened'] - connections_opened
+                stats.cache_hits += self._count_cache_hits() - cache_hits
+
+    def _run_search(self, actor1: str, actor2: str, search: Callable[[SearchStats], SearchResult],
+                    restrictions: tuple[str, int, int] | None = None) -> SearchResult:
+        """
+        Run search, which fills in the statistics it is given, between actor1 and actor2. The database work and time of
+        the search are added to its statistics, and the search is logged to LOGGER.
+
+        restrictions are the restrictions of the search, if it is restricted, only used for logging.
+        """
+        return self._run_searches(actor1, [actor2], lambda stats: {actor2: search(stats)}, restrictions,
+                                  'path' if restrictions is None else 'restricted_path')[actor2]
+
+    def _run_searches(self, actor1: str, targets: list[str], search: Callable[[SearchStats], dict[str, SearchResult]],
+                      restrictions: tuple[str, int, int] | None = None,
+                      endpoint: str = 'paths') -> dict[str, SearchResult]:
+        """
+        Run search, which fills in the statistics it is given, from actor1 to each of targets, as _run_search does. The
+        search is logged once for each target, and recorded to the query log, if there is one, under endpoint. If
+        profiling is on, the search is profiled as a stage labelled with endpoint, actor1, and targets.
+
+        If actor1 is one of targets but isn't in the database, search isn't run, and every target is given a NOT_FOUND
+        result, as it would be for any other search from an id that isn't in the database.
+        """
+        stats = SearchStats()
+        with profiling.stage(endpoint, actor1, *targets), self._tracked(stats, 'search_time'):
+            if actor1 in targets and actor1 not in self.get_names([actor1]):
+                results = {target: SearchResult(NOT_FOUND, [], stats) for target in targets}
+            else:
+                results = search(stats)
+
+        if self._query_log is not None:
+            self._query_log.record({
+                'time': time.time(), 'endpoint': endpoint, 'actor1': actor1, 'targets': targets,
+                'restrictions': restrictions, 'latency': stats.search_time,
+                'statuses': [results[target].status for target in targets],
+                'path_lengths': [len(results[target].path) for target in targets], 'backend': type(self).__name__
+            })
+
+        if LOGGER.isEnabledFor(logging.INFO):
+            for actor2 in targets:
+                result = results[actor2]
+                record = {'actor1': actor1, 'actor2': actor2, 'restrictions': restrictions, 'status': result.status,
+                          'cut_off_reason': result.cut_off_reason, 'path_length': len(result.path),
+                          'backend': type(self).__name__, **stats.as_dict()}
+                LOGGER.info(json.dumps(record), extra={'search': record})
+
+        return results
+
+    def make_networkx_graph(self, path: list[str], stats: SearchStats | None = None) -> nx.Graph:
         """
         Given a path, creates a NetworkX graph using the nodes in the path. Also includes nodes branching from the path
         for visual comparison.
 
         These nodes have attributes for the colours of the nodes. Check now deprecated output_graph for how that is
-        expected to work
+        expected to work. The names of the nodes of the path, in order, are stored in the graph's 'path' attribute.
+
+        If stats is given, the work done looking up the names of the nodes is added to it.
 
         Preconditions:
             - path is a valid path in the database
         """
-        nx_graph = nx.Graph()
+        with self._tracked(stats, 'name_time'):
+            return self._build_networkx_graph(path)
+
+    def _build_networkx_graph(self, path: list[str]) -> nx.Graph:
+        """
+        Given a path, creates the NetworkX graph described in make_networkx_graph. NetworkX is only imported here, so
+        searching doesn't have to wait for it to load.
+
+        The graph is first built out of ids, so the names of all its nodes can be looked up at once at the end.
+        """
+        import networkx as nx
+
+        id_graph = nx.Graph()
 
         for node_index in range(len(path) - 1):
-            current_node_name = self.get_name(path[node_index])
             adjacent_nodes = self.get_adjacent_nodes(path[node_index])
 
             adjacent_nodes.remove(path[node_index + 1])
 
-            if path[node_index][0:2] == 'tt':
-                nx_graph.add_node(current_node_name, color='salmon')
-            else:
-                nx_graph.add_node(current_node_name, color='bisque')
-            nx_graph.add_edge(current_node_name, self.get_name(path[node_index + 1]))
+            id_graph.add_node(path[node_index], color=_node_colour(path[node_index]))
+            id_graph.add_edge(path[node_index], path[node_index + 1])
 
             nodes_to_add = RANDOM_NODE_COUNT
 
             while nodes_to_add > 0 and len(adjacent_nodes) > 0:
                 connected_node_id = adjacent_nodes.pop()
-                connected_node_name = self.get_name(connected_node_id)
-                if connected_node_id[0:2] == 'tt':
-                    nx_graph.add_node(connected_node_name, color='salmon')
-                else:
-                    nx_graph.add_node(connected_node_name, color='bisque')
-                nx_graph.add_edge(current_node_name, connected_node_name)
+                id_graph.add_node(connected_node_id, color=_node_colour(connected_node_id))
+                id_graph.add_edge(path[node_index], connected_node_id)
                 nodes_to_add -= 1
 
-        last_node_name = self.get_name(path[-1])
         nodes_to_add = RANDOM_NODE_COUNT
         adjacent_nodes = self.get_adjacent_nodes(path[-1])
 
-        if len(path) <= 1:
-            nx_graph.add_node(self.get_name(path[0]), color='green')
-        else:
-            nx_graph.nodes[self.get_name(path[0])]['color'] = 'green'
-
+        id_graph.add_node(path[0], color='green')
+        if len(path) > 1:
             adjacent_nodes.remove(path[-2])
 
         while nodes_to_add > 0 and len(adjacent_nodes) > 0:
             connected_node_id = adjacent_nodes.pop()
-            connected_node_name = self.get_name(connected_node_id)
-            if connected_node_id[0:2] == 'tt':
-                nx_graph.add_node(connected_node_name, color='salmon')
-            else:
-                nx_graph.add_node(connected_node_name, color='bisque')
-            nx_graph.add_edge(last_node_name, connected_node_name)
+            id_graph.add_node(connected_node_id, color=_node_colour(connected_node_id))
+            id_graph.add_edge(path[-1], connected_node_id)
             nodes_to_add -= 1
 
-        nx_graph.add_node(self.get_name(path[-1]), color='green')
+        id_graph.add_node(path[-1], color='green')
+
+        names = self.get_names(list(id_graph.nodes))
+        nx_graph = nx.Graph()
+        for node_id, colour in id_graph.nodes(data='color'):
+            nx_graph.add_node(names[node_id], color=colour)
+        nx_graph.add_edges_from((names[node1], names[node2]) for node1, node2 in id_graph.edges)
+        nx_graph.nodes[names[path[0]]]['color'] = 'green'
+        nx_graph.nodes[names[path[-1]]]['color'] = 'green'
+        nx_graph.graph['path'] = [names[node_id] for node_id in path]
         return nx_graph
 
     def get_name(self, object_id: str) -> str:
@@ -129,19 +837,44 @@ class ShortestActorGraph:
         Preconditions:
             - id is a valid actor or movie id
         """
-        connection = sql.connect(self._db_path)
-        cursor = connection.cursor()
+        with self._connect(self._database_for(object_id)) as connection:
+            cursor = connection.cursor()
 
-        if object_id[0:2] == 'tt':
-            name = cursor.execute("""SELECT title FROM movie WHERE id = ?""", (object_id,)).fetchone()[0]
-        else:
-            name = cursor.execute("""SELECT name FROM actor WHERE id = ?""", (object_id,)).fetchone()[0]
-        cursor.close()
-        connection.close()
+            if object_id[0:2] == 'tt':
+                name = cursor.execute("""SELECT title FROM movie WHERE id = ?""", (object_id,)).fetchone()[0]
+            else:
+                name = cursor.execute("""SELECT name FROM actor WHERE id = ?""", (object_id,)).fetchone()[0]
+            cursor.close()
 
         return name
 
-    def get_actor_id(self, actor_name: str, played_in: str = '') -> str:
+    def get_names(self, object_ids: list[str]) -> dict[str, str]:
+        """
+        Given a list of ids (Whether movie or actor), return a mapping from each id to its title or actor, looking them
+        all up together with a few queries instead of one query each. Ids that aren't in the database are left out.
+        """
+        movie_ids = [object_id for object_id in set(object_ids) if object_id[0:2] == 'tt']
+        actor_ids = [object_id for object_id in set(object_ids) if object_id[0:2] != 'tt']
+
+        names = self._lookup('movie', 'id', 'title', movie_ids)
+        names.update(self._lookup('actor', 'id', 'name', actor_ids))
+        return names
+
+    def describe_result(self, result: SearchResult) -> dict:
+        """
+        Return a description of a search's result, with the names of the nodes of its path, ready to be turned into
+        JSON. The names are looked up together.
+        """
+        names = self.get_names(result.path)
+        return {
+            'status': result.status,
+            'cut_off_reason': result.cut_off_reason,
+            'path': result.path,
+            'names': [names[node_id] for node_id in result.path],
+            'stats': result.stats.as_dict()
+        }
+
+    def get_actor_id(self, actor_name: str, played_in: str = '', stats: SearchStats | None = None) -> str:
         """
         Given an actor's name, return their id.
 
@@ -151,6 +884,8 @@ class ShortestActorGraph:
         Returns an empty string if the actor doesn't exist, or there are more than one actor that fit the description.
         If there are more than one actor that fit the description, return 'tm'
 
+        If stats is given, the work done looking up the id is added to it.
+
         >>> a = ShortestActorGraph('data_files/actors_and_movies.db')
         >>> a.get_actor_id('Kevin Bacon')
         'tm'
@@ -160,49 +895,46 @@ class ShortestActorGraph:
         >>> s.get_actor_id('Leonardo DiCaprio')
         'nm0000138'
         """
-        with sql.connect(self._db_path) as connection:
-            cursor = connection.cursor()
-            if played_in == '':
-                response = cursor.execute("""
-                    SELECT id FROM actor WHERE name = ?
-                    """, (actor_name,)).fetchall()
+        with self._tracked(stats, 'name_time'):
+            return self._find_actor_id(actor_name, played_in)
 
-                cursor.close()
-                if len(response) == 0:
-                    return ''
-                elif len(response) > 1:
-                    return 'tm'
-                else:
-                    return response[0][0]
-            else:
-                played_in = cursor.execute("""
-                            SELECT id FROM movie WHERE title = ?
-                    """, (played_in,)).fetchall()
-
-                if len(played_in) == 0:
-                    cursor.close()
-                    return ''
-
-                list_of_actors = cursor.execute("""
+    def _find_actor_id(self, actor_name: str, played_in: str) -> str:
+        """
+        Given an actor's name, and optionally a movie they played in, return their id as described in get_actor_id
+        """
+        list_of_actors = []
+        played_in_ids = set()
+        for database in self._databases():
+            with self._connect(database) as connection:
+                cursor = connection.cursor()
+                list_of_actors.extend(actor[0] for actor in cursor.execute("""
                     SELECT id FROM actor WHERE name = ?
-                    """, (actor_name,)).fetchall()
+                    """, (actor_name,)))
 
-                for actor in list_of_actors:
-                    movies_played_in = cursor.execute("""
-                        SELECT connections FROM edge WHERE object_id = ?
-                        """, (actor[0],)).fetchone()
+                if played_in != '':
+                    played_in_ids.update(movie[0] for movie in cursor.execute("""
+                                SELECT id FROM movie WHERE title = ?
+                        """, (played_in,)))
+                cursor.close()
 
-                    if movies_played_in is None:
-                        continue
+        if played_in == '':
+            if len(list_of_actors) == 0:
+                return ''
+            elif len(list_of_actors) > 1:
+                return 'tm'
+            else:
+                return list_of_actors[0]
 
-                    movies_played_in = movies_played_in[0].split(',')
+        if len(played_in_ids) == 0:
+            return ''
 
-                    if any(possible_played_in[0] in movies_played_in for possible_played_in in played_in):
-                        cursor.close()
-                        return actor[0]
+        movies_played_in = self._lookup('edge', 'object_id', 'connections', list_of_actors)
+        for actor_id in list_of_actors:
+            if actor_id in movies_played_in and any(movie_id in played_in_ids
+                                                    for movie_id in movies_played_in[actor_id].split(',')):
+                return actor_id
 
-            cursor.close()
-            return ''
+        return ''
 
     def get_adjacent_nodes(self, given_id: str) -> set[str]:
         """
@@ -218,7 +950,89 @@ class ShortestActorGraph:
         >>> a.get_adjacent_nodes('tt1375666') == {'nm0000138', 'nm0330687', 'nm0680983', 'nm0913822', 'nm0362766', 'nm2438307', 'nm0614165', 'nm0000297', 'nm0182839', 'nm0000592'}
         True
         """
-        with sql.connect(self._db_path) as connection:
+        return self._adjacent_nodes_in(self._database_for(given_id), given_id)
+
+    def get_adjacent_nodes_batch(self, given_ids: list[str]) -> dict[str, set[str]]:
+        """
+        Given a list of actor or movie ids, return a mapping from each id to its adjacent nodes, looking them up
+        together with a query per database (or shard) for every LOOKUP_BATCH_SIZE ids. Ids that aren't in the graph are
+        mapped to an empty set.
+        """
+        connections = self._lookup('edge', 'object_id', 'connections', given_ids)
+        return {given_id: set(connections[given_id].split(',')) if given_id in connections else set()
+                for given_id in given_ids}
+
+    def get_adjacent_nodes_parallel(self, given_ids: list[str]) -> dict[str, set[str]]:
+        """
+        Return the same mapping as get_adjacent_nodes_batch, with given_ids split into a chunk for each of this graph's
+        search threads, of at least PARALLEL_CHUNK_SIZE ids. Each chunk is looked up, and its connections split, by a
+        thread of the pool on its own connection, so the queries of different chunks run at the same time. The chunks
+        are merged in the order of given_ids, whichever thread finishes first.
+
+        The work of the pool threads is counted as this thread's, so a search's statistics include it. Since each chunk
+        is a query of its own, and each pool thread opens its own connections, a search looked up this way runs more
+        SQL statements and opens more connections than the same search on one thread, though it finds the same paths.
+        """
+        chunk_size = max(PARALLEL_CHUNK_SIZE, -(-len(given_ids) // self._search_threads))
+        if len(given_ids) <= chunk_size:
+            return self.get_adjacent_nodes_batch(given_ids)
+
+        with self._pool_lock:
+            if self._search_pool is None:
+                self._search_pool = ThreadPoolExecutor(self._search_threads, thread_name_prefix='search')
+
+        chunks = [given_ids[start:start + chunk_size] for start in range(0, len(given_ids), chunk_size)]
+        adjacent_nodes = {}
+        counts = self._thread_counts()
+        for chunk_adjacent_nodes, chunk_counts in self._search_pool.map(self._look_up_chunk, chunks):
+            adjacent_nodes.update(chunk_adjacent_nodes)
+            for name, count in chunk_counts.items():
+                counts[name] += count
+        return adjacent_nodes
+
+    def _look_up_chunk(self, given_ids: list[str]) -> tuple[dict[str, set[str]], dict[str, int]]:
+        """
+        Return the adjacent nodes of each of given_ids, as get_adjacent_nodes_batch does, and the work this thread did
+        looking them up. Runs on a thread of the search pool.
+        """
+        counts = self._thread_counts()
+        before = dict(counts)
+        adjacent_nodes = self.get_adjacent_nodes_batch(given_ids)
+        return adjacent_nodes, {name: counts[name] - before[name] for name in counts}
+
+    def close(self) -> None:
+        """
+        Stop this graph's pool of search threads, if it was started, waiting for their lookups to finish, and close
+        the read only connections every thread has open. The pool is started, and the connections opened, again if the
+        graph is searched afterwards.
+
+        The graph must not be searched on any thread while it is being closed.
+        """
+        with self._pool_lock:
+            search_pool, self._search_pool = self._search_pool, None
+        # The pool's threads may open connections while finishing their lookups, so the lock isn't held while waiting
+        if search_pool is not None:
+            search_pool.shutdown()
+
+        with self._pool_lock:
+            for connection in self._open_connections:
+                connection.close()
+            self._open_connections = []
+            self._connections = threading.local()
+
+    def _adjacent_nodes_of(self) -> Callable[[list[str]], dict[str, set[str]]]:
+        """
+        Return the function searches look up the adjacent nodes of a list of ids with, which uses several threads if
+        this graph has more than one search thread
+        """
+        return self.get_adjacent_nodes_batch if self._search_threads <= 1 else self.get_adjacent_nodes_parallel
+
+    def _adjacent_nodes_in(self, database_path: str, given_id: str) -> set[str]:
+        """
+        Given an actor or movie id, return the adjacent nodes to that id using the edge table of the database in
+        database_path
+        """
+        with self._connect(database_path) as connection:
             cursor = connection.cursor()
             connected_nodes = cursor.execute("""
                                     SELECT connections FROM edge WHERE object_id = ?
@@ -238,21 +1052,26 @@ class ShortestActorGraph:
         Preconditions:
             - is_alive.lower() in ["alive", "deceased", ""]
         """
-        with sql.connect(self._db_path) as connection:
-            cursor = connection.cursor()
+        valid_actors = []
+        for database in self._databases():
+            with self._connect(database) as connection:
+                cursor = connection.cursor()
+                alive = 'deathYear IS NULL' if sql_processing.is_typed_schema(connection) else "deathYear = '\\N'"
+
+                if is_alive == 'alive':
+                    valid_actors += cursor.execute(f"""
+                                SELECT name FROM actor WHERE {alive}
+                        """).fetchall()
+                elif is_alive == 'deceased':
+                    valid_actors += cursor.execute(f"""
+                                SELECT name FROM actor WHERE NOT ({alive})
+                        """).fetchall()
+                else:
+                    valid_actors += cursor.execute("""
+                                SELECT name FROM actor
+                        """).fetchall()
 
-            if is_alive == 'alive':
-                return cursor.execute("""
-                            SELECT name FROM actor WHERE deathYear = '\\N'
-                    """).fetchall()
-            elif is_alive == 'deceased':
-                return cursor.execute("""
-                            SELECT name FROM actor WHERE deathYear != '\\N'
-                    """).fetchall()
-            else:
-                return cursor.execute("""
-                            SELECT name FROM actor
-                    """).fetchall()
+        return valid_actors
 
     def get_path(self, actor1: str, actor2: str) -> list[str]:
         """
@@ -267,27 +1086,225 @@ class ShortestActorGraph:
         >>> s.get_path('nm0000206', 'nm0000138') != []
         True
         """
-        if actor1 == actor2:
-            return [actor1]
+        return self.find_path(actor1, actor2).path
+
+    def find_path(self, actor1: str, actor2: str, limits: SearchLimits | None = None) -> SearchResult:
+        """
+        Given two actor IDs, search for the shortest path between the two actors, stopping early if the search goes
+        past any of the given limits.
+
+        Preconditions:
+            - The actors are in the graph
+
+        >>> s = ShortestActorGraph('data_files/actors_and_movies.db')
+        >>> s.find_path('nm0000206', 'nm0000138').status
+        'found'
+        >>> s.find_path('nm0000206', 'nm0000138', SearchLimits(max_expansions=0)).status
+        'cut off'
+        >>> s.find_path('nm9999999', 'nm9999999').status
+        'not found'
+        """
+        if self._use_costar:
+            return self._run_search(actor1, actor2, lambda stats: self._find_costar_path(actor1, actor2, stats, limits))
+
+        return self._run_search(actor1, actor2, lambda stats: self._breadth_first_search(
+            actor1, actor2, self._adjacent_nodes_of(), stats, limits=limits))
+
+    def find_paths(self, actor1: str, targets: list[str],
+                   limits: SearchLimits | None = None) -> dict[str, SearchResult]:
+        """
+        Given an actor ID and a list of target actor IDs, search for the shortest path from actor1 to every target at
+        once, stopping once all of them are found or the search goes past any of the given limits. Return a mapping
+        from each target to the result of its search.
+
+        All the paths come from a single search, so finding them takes about as long as finding the path to the
+        farthest target alone. The results share the statistics of that search.
+
+        Preconditions:
+            - The actors are in the graph
+
+        >>> s = ShortestActorGraph('data_files/actors_and_movies.db')
+        >>> results = s.find_paths('nm0000206', ['nm0000138', 'nm0000206'])
+        >>> results['nm0000138'].path == s.get_path('nm0000206', 'nm0000138')
+        True
+        >>> results['nm0000206'].path
+        ['nm0000206']
+        """
+        if self._use_costar:
+            return self._run_searches(actor1, targets, lambda stats: self._find_costar_paths(
+                actor1, targets, stats, limits))
+
+        return self._run_searches(actor1, targets, lambda stats: self._search_targets(
+            actor1, targets, self._adjacent_nodes_of(), stats, limits=limits))
+
+    def get_costars(self, actor_id: str) -> dict[str, str]:
+        """
+        Given an actor id, return a mapping from each actor they played alongside to a movie the two were both in, using
+        the costar table of the database in _db_path
+
+        Preconditions:
+            - The database has a costar table
+        """
+        with self._connect(self._database_for(actor_id)) as connection:
+            cursor = connection.cursor()
+            costars = cursor.execute("""
+                                    SELECT connections FROM costar WHERE actor_id = ?
+                            """, (actor_id,)).fetchone()
+
+            cursor.close()
+
+            if costars is None or costars[0] == '':
+                return {}
+
+            return dict(costar.split(':') for costar in costars[0].split(','))
+
+    def _find_costar_path(self, actor1: str, actor2: str, stats: SearchStats,
+                          limits: SearchLimits | None) -> SearchResult:
+        """
+        Search for the shortest path between actor1 and actor2 through the costar table, then put the movie linking
+        each pair of actors back in between them, so the path alternates between actors and movies like any other.
+
+        The statistics of the search only count actors.
+        """
+        return self._find_costar_paths(actor1, [actor2], stats, limits)[actor2]
+
+    def _find_costar_paths(self, actor1: str, targets: list[str], stats: SearchStats,
+                           limits: SearchLimits | None) -> dict[str, SearchResult]:
+        """
+        Search for the shortest path from actor1 to each of targets through the costar table, as _find_costar_path
+        does for a single target
+        """
+        def costars_batch(actor_ids: list[str]) -> dict[str, set[str]]:
+            costars = self._lookup('costar', 'actor_id', 'connections', actor_ids)
+            return {actor_id: {costar.split(':')[0] for costar in costars.get(actor_id, '').split(',') if costar != ''}
+                    for actor_id in actor_ids}
+
+        results = self._search_targets(actor1, targets, costars_batch, stats, limits=limits)
+
+        for result in results.values():
+            actor_path = result.path
+            result.path = actor_path[0:1]
+            for actor_index in range(len(actor_path) - 1):
+                result.path.append(self.get_costars(actor_path[actor_index])[actor_path[actor_index + 1]])
+                result.path.append(actor_path[actor_index + 1])
+
+        return results
+
+    @staticmethod
+    def _breadth_first_search(actor1: str, actor2: str, adjacent_nodes: Callable[[list[str]], dict[str, set[str]]],
+                              stats: SearchStats, valid_nodes: Callable[[list[str]], set[str]] | None = None,
+                              limits: SearchLimits | None = None) -> SearchResult:
+        """
+        Search for the shortest path between actor1 and actor2, as _search_targets does with actor2 as the only target
+        """
+        return ShortestActorGraph._search_targets(actor1, [actor2], adjacent_nodes, stats, valid_nodes, limits)[actor2]
 
-        queue = deque()
-        queue.append([actor1])
-        visited = set()
-        visited.add(actor1)
+    @staticmethod
+    def _search_targets(actor1: str, targets: list[str], adjacent_nodes: Callable[[list[str]], dict[str, set[str]]],
+                        stats: SearchStats, valid_nodes: Callable[[list[str]], set[str]] | None = None,
+                        limits: SearchLimits | None = None) -> dict[str, SearchResult]:
+        """
+        Search for the shortest path from actor1 to each of targets in the graph given by adjacent_nodes, which maps a
+        list of node ids to the ids of the nodes adjacent to each. The search goes one level at a time, recording the
+        node each new node was reached from, so the path to every target can be traced back from the same record. It
+        stops as soon as every target is found. The nodes of each level are looked up LOOKUP_BATCH_SIZE at a time, so a
+        database is queried once per batch instead of once per node.
+
+        If valid_nodes is given, only the nodes it keeps are expanded. It is given the new nodes found in each batch
+        together, and returns the ones that are valid. Targets are always accepted as the end of a path, but are only
+        searched through on the way to other targets if they are valid.
+
+        The limits are checked before each node is expanded, and told of the search's progress before each level. The
+        progress of the search is recorded in stats, which every result shares. Targets that weren't found when the
+        search was cut off or ran out of nodes are given a CUT_OFF or NOT_FOUND result.
+
+        >>> star = {'hub': {'a', 'b', 'c', 'd', 'e', 'f'}, **{leaf: {'hub'} for leaf in 'abcdef'}}
+        >>> def star_adjacent_nodes(node_ids: list[str]) -> dict[str, set[str]]:
+        ...     return {node_id: star[node_id] for node_id in node_ids}
+        >>> ShortestActorGraph._search_targets('hub', ['z'], star_adjacent_nodes, SearchStats())['z'].status
+        'not found'
+        >>> results = ShortestActorGraph._search_targets('hub', ['z'], star_adjacent_nodes, SearchStats(),
+        ...                                              limits=SearchLimits(max_expansions=3))
+        >>> [results['z'].status, results['z'].cut_off_reason, results['z'].stats.nodes_expanded]
+        ['cut off', 'budget', 3]
+        """
+        results = {}
+        remaining = set(targets)
+        if actor1 in remaining:
+            results[actor1] = SearchResult(FOUND, [actor1], stats)
+            remaining.remove(actor1)
+
+        parents = {actor1: ''}
+        frontier = [actor1]
+
+        while frontier and len(remaining) > 0:
+            stats.depth += 1
+            stats.peak_frontier = max(stats.peak_frontier, len(frontier))
+            if limits is not None:
+                limits.report_progress(stats.depth, len(parents))
+            next_frontier = []
+
+            for batch_start in range(0, len(frontier), LOOKUP_BATCH_SIZE):
+                batch = frontier[batch_start:batch_start + LOOKUP_BATCH_SIZE]
+                looked_up = batch
+                if limits is not None and limits.max_expansions is not None:
+                    # The search is cut off before expanding the nodes past its budget, so they aren't looked up
+                    looked_up = batch[:max(limits.max_expansions - stats.nodes_expanded, 1)]
+                new_nodes, cut_off_reason = ShortestActorGraph._expand_batch(
+                    batch, adjacent_nodes(looked_up), parents, remaining, results, stats, limits)
+                if cut_off_reason != '':
+                    stats.visited = len(parents)
+                    return {target: results.get(target, SearchResult(CUT_OFF, [], stats, cut_off_reason))
+                            for target in targets}
+                elif len(remaining) == 0:
+                    stats.visited = len(parents)
+                    return {target: results[target] for target in targets}
+
+                if valid_nodes is None:
+                    next_frontier.extend(new_nodes)
+                else:
+                    valid = valid_nodes(new_nodes)
+                    next_frontier.extend(node for node in new_nodes if node in valid)
 
-        while queue:
-            curr_path = queue.popleft()
-            curr_node = curr_path[-1]
+            frontier = next_frontier
 
-            for adjacent in self.get_adjacent_nodes(curr_node):
-                if adjacent == actor2:
-                    return curr_path + [adjacent]
+        stats.visited = len(parents)
+        return {target: results.get(target, SearchResult(NOT_FOUND, [], stats)) for target in targets}
 
-                if adjacent not in visited:
-                    visited.add(adjacent)
-                    queue.append(curr_path + [adjacent])
+    @staticmethod
+    def _expand_batch(batch: list[str], batch_adjacent_nodes: dict[str, set[str]], parents: dict[str, str],
+                      remaining: set[str], results: dict[str, SearchResult], stats: SearchStats,
+                      limits: SearchLimits | None) -> tuple[list[str], str]:
+        """
+        Expand each node of batch in order for _search_targets, with the adjacent nodes of each node in
+        batch_adjacent_nodes. Each node reached for the first time has the node it was reached from recorded in parents,
+        and each of remaining reached is given a FOUND result in results and removed from remaining.
 
-        return []
+        Return the nodes reached for the first time, and the reason the limits cut the search off before a node was
+        expanded, or an empty string if they didn't. Expanding stops early if the search is cut off or remaining runs
+        out.
+        """
+        new_nodes = []
+        for curr_node in batch:
+            cut_off_reason = '' if limits is None else limits.cut_off_reason(stats.nodes_expanded)
+            if cut_off_reason != '':
+                return new_nodes, cut_off_reason
+
+            stats.nodes_expanded += 1
+            for adjacent in batch_adjacent_nodes[curr_node]:
+                stats.neighbours_scanned += 1
+                if adjacent in parents:
+                    continue
+
+                parents[adjacent] = curr_node
+                new_nodes.append(adjacent)
+                if adjacent in remaining:
+                    results[adjacent] = SearchResult(FOUND, _trace_path(parents, adjacent), stats)
+                    remaining.remove(adjacent)
+                    if len(remaining) == 0:
+                        return new_nodes, ''
+
+        return new_nodes, ''
 
     def match_requirements(self, node_id: str, want_alive: str, want_before: int, want_after: int) -> bool:
         """
@@ -313,29 +1330,38 @@ class ShortestActorGraph:
         >>> p.match_requirements(old_movie, '', 9999, 1990)
         False
         """
-        connection = sql.connect(self._db_path)
-        cursor = connection.cursor()
+        return node_id in self.filter_requirements([node_id], want_alive, want_before, want_after)
 
-        if node_id[0:2] == 'nm':
-            death_state = cursor.execute("""SELECT deathYear FROM actor WHERE id = ?""", (node_id,)).fetchone()
+    def filter_requirements(self, node_ids: list[str], want_alive: str, want_before: int,
+                            want_after: int) -> set[str]:
+        """
+        Given a list of node IDs, return the ones that match all the requirements of match_requirements. The attributes
+        of the nodes are looked up together, LOOKUP_BATCH_SIZE at a time, instead of one node at a time.
 
-            if death_state is None:
-                satisfied_requirements = True
+        Nodes that aren't in the actor or movie tables always match, as do actors and movies whose death or release
+        year is unknown, which is NULL if the database was migrated by sql_processing.migrate_typed_schema and '\\N'
+        otherwise.
+        """
+        death_years = self._lookup('actor', 'id', 'deathYear',
+                                   [node_id for node_id in node_ids if node_id[0:2] == 'nm'])
+        release_years = self._lookup('movie', 'id', 'startYear',
+                                     [node_id for node_id in node_ids if node_id[0:2] != 'nm'])
+
+        matching_nodes = set()
+        for node_id in node_ids:
+            if node_id[0:2] == 'nm':
+                # If actor is dead and we want alive nodes, they don't match
+                satisfied_requirements = (node_id not in death_years or want_alive.lower() == "any"
+                                          or ((sql_processing.year_value(death_years[node_id]) is None)
+                                              == (want_alive.lower() == "alive")))
             else:
-                satisfied_requirements = ((death_state[0] == "\\N") == (want_alive.lower() == "alive")
-                                          or want_alive.lower() == "any")
-        else:
-            release_year = cursor.execute("""SELECT startYear FROM movie WHERE id = ?""", (node_id,)).fetchone()
+                release_year = sql_processing.year_value(release_years.get(node_id))
+                satisfied_requirements = release_year is None or want_after < release_year < want_before
 
-            if release_year is None or not release_year[0].isnumeric():
-                satisfied_requirements = True
-            else:
-                satisfied_requirements = want_after < int(release_year[0]) < want_before
-        # If actor is dead and we want alive nodes:
+            if satisfied_requirements:
+                matching_nodes.add(node_id)
 
-        cursor.close()
-        connection.close()
-        return satisfied_requirements
+        return matching_nodes
 
     def get_restricted_path(self, actor1: str, actor2: str, check_is_alive: str = "Any",
                             released_before: int = 9999, released_after: int = 0) -> list[str]:
@@ -351,35 +1377,99 @@ class ShortestActorGraph:
 
         Return an empty list if no such path exists.
 
+        If this graph has materialized views, the search runs on the view for these restrictions instead, building it
+        first if this is the first time they were requested.
+
+        Preconditions:
+            - is_alive.lower() in ["alive", "deceased", ""]
+        """
+        return self.find_restricted_path(actor1, actor2, check_is_alive, released_before, released_after).path
+
+    def find_restricted_path(self, actor1: str, actor2: str, check_is_alive: str = "Any",
+                             released_before: int = 9999, released_after: int = 0,
+                             limits: SearchLimits | None = None) -> SearchResult:
+        """
+        Given two actor IDs, search for the shortest path between the two with the same restrictions as
+        get_restricted_path, stopping early if the search goes past any of the given limits.
+
         Preconditions:
             - is_alive.lower() in ["alive", "deceased", ""]
         """
-        if actor1 == actor2:
-            return [actor1]
+        restrictions = (check_is_alive, released_before, released_after)
 
-        queue = deque()
-        queue.append([actor1])
-        visited = set()
-        visited.add(actor1)
+        if self._views is not None and actor1 != actor2:
+            return self._run_search(actor1, actor2, lambda stats: self._find_view_path(
+                actor1, actor2, self._views.get_view(*restrictions), stats, limits), restrictions)
 
-        # Initialize SQL connection:
+        def valid_nodes(node_ids: list[str]) -> set[str]:
+            return self.filter_requirements(node_ids, *restrictions)
 
-        while queue:
-            curr_path = queue.popleft()
-            curr_node = curr_path[-1]
+        return self._run_search(actor1, actor2, lambda stats: self._breadth_first_search(
+            actor1, actor2, self._adjacent_nodes_of(), stats, valid_nodes, limits), restrictions)
 
-            for adjacent in self.get_adjacent_nodes(curr_node):
-                # Return found path!
-                if adjacent == actor2:
-                    return curr_path + [adjacent]
+    def _find_view_path(self, actor1: str, actor2: str, view_path: str, stats: SearchStats,
+                        limits: SearchLimits | None) -> SearchResult:
+        """
+        Search for the shortest path between actor1 and actor2 using the restricted view at view_path.
+
+        Like get_restricted_path, actor2 itself doesn't have to match the restrictions. As the view may have pruned
+        actor2 from the adjacency lists, actor2 is added back to the nodes adjacent to each of its movies.
+        """
+        target_links = self.get_adjacent_nodes(actor2)
+
+        def view_adjacent_nodes(given_ids: list[str]) -> dict[str, set[str]]:
+            connections = self._lookup('edge', 'object_id', 'connections', given_ids, view_path)
+            adjacent_nodes = {}
+            for given_id in given_ids:
+                adjacent_nodes[given_id] = set(connections[given_id].split(',')) if given_id in connections else set()
+                if given_id in target_links:
+                    adjacent_nodes[given_id].add(actor2)
+            return adjacent_nodes
+
+        return self._breadth_first_search(actor1, actor2, view_adjacent_nodes, stats, limits=limits)
+
+
+def open_graph(database_path: str, backend: str = 'sqlite', view_directory: str = '', read_only: bool = False,
+               query_log: QueryLog | None = None, search_threads: int = 1) -> ShortestActorGraph:
+    """
+    Return the graph of the database at database_path searched with backend. The sparse backend is a
+    sparse_processing.SparseActorGraph, so NumPy and SciPy are only imported if it is used, and it ignores the
+    arguments of ShortestActorGraph other than query_log.
+
+    Preconditions:
+        - backend in BACKENDS
+    """
+    if backend == 'sparse':
+        import sparse_processing
+        return sparse_processing.SparseActorGraph(database_path, query_log)
 
-                # Check Neighbours that are not
-                if adjacent not in visited:
-                    visited.add(adjacent)
-                    if self.match_requirements(adjacent, check_is_alive, released_before, released_after):
-                        queue.append(curr_path + [adjacent])
+    return ShortestActorGraph(database_path, view_directory=view_directory, use_costar=backend == 'costar',
+                              read_only=read_only, query_log=query_log, search_threads=search_threads)
 
-        return []
+
+def _node_colour(node_id: str) -> str:
+    """
+    Return the colour a node with node_id is drawn in, unless it is at either end of a path
+
+    >>> _node_colour('tt0000001')
+    'salmon'
+    """
+    return 'salmon' if node_id[0:2] == 'tt' else 'bisque'
+
+
+def _trace_path(parents: dict[str, str], node_id: str) -> list[str]:
+    """
+    Return the path from the start of a search to node_id, following the node each node was reached from in parents.
+    The start of the search is the node whose parent is the empty string.
+
+    >>> _trace_path({'nm1': '', 'tt1': 'nm1', 'nm2': 'tt1'}, 'nm2')
+    ['nm1', 'tt1', 'nm2']
+    """
+    path = [node_id]
+    while parents[path[-1]] != '':
+        path.append(parents[path[-1]])
+    path.reverse()
+    return path
 
 
 if __name__ == '__main__':
@@ -390,7 +1480,9 @@ if __name__ == '__main__':
     python_ta.check_all(config={
         'max-line-length': 120,
         'disable': ['E1136'],
-        'extra-imports': ['csv', 'networkx', 'sqlite3', 'collections', 'matplotlib.pyplot'],
-        'allowed-io': ['load_review_graph'],
+        'extra-imports': ['csv', 'networkx', 'sqlite3', 'collections', 'collections.abc', 'matplotlib.pyplot', 'os',
+                          'time', 'threading', 'json', 'logging', 'contextlib', 'pathlib', 'typing', 'profiling',
+                          'sql_processing', 'concurrent.futures', 'sparse_processing'],
+        'allowed-io': ['load_review_graph', 'ShardRouter.__init__', 'QueryLog.__init__'],
         'max-nested-blocks': 4
     })
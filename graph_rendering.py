@@ -0,0 +1,198 @@
+"""
+Module Description
+==================
+A file with the layout and drawing of the graphs made by ShortestActorGraph.make_networkx_graph, shared by the GUI
+and everything else that draws a path.
+
+Graphs are laid out around their path, which is stored in graph.graph['path']. The path runs in straight rows, from
+left to right then back again like a snake, with the nodes branching off each node of the path fanned out above and
+below it. Small graphs are then relaxed with a spring layout, keeping the path where it is, while large graphs keep
+this layout as it is, since it takes time linear in the number of nodes. Either way, the layout of a path is cached,
+so showing the same path again doesn't lay it out again.
+
+Copyright and Usage Information
+===============================
+This file is solely provided for the use in grading and review of the named student's
+work by the TAs and Professors of CSC111. All further distribution of this code whether
+as is or modified is firmly prohibited.
+
+This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+import networkx as nx
+from matplotlib.axes import Axes
+
+# The largest number of nodes a graph can have to be relaxed with a spring layout, and the number of iterations used
+SPRING_NODE_LIMIT = 150
+SPRING_ITERATIONS = 30
+
+# The horizontal distance between the nodes branching off the same node of a path, and the vertical distance between
+# the rows they are fanned out in
+BRANCH_SPREAD = 0.3
+BRANCH_HEIGHT = 0.6
+
+# The number of nodes of a path in each row of its layout, and the vertical distance between the rows
+ROW_LENGTH = 5
+ROW_GAP = 2.5
+
+# The default number of layouts a LayoutCache keeps
+LAYOUT_CACHE_SIZE = 32
+
+# The share of the width or height of a drawing left empty around it
+PADDING = 0.05
+
+
+class LayoutCache:
+    """
+    A cache of the layouts of the most recently laid out paths. It can be used from several threads at once.
+
+    Instance Attributes:
+        - hits: The number of times a layout was taken from the cache instead of being made
+
+    Representation Invariants:
+        - self.hits >= 0
+    """
+    hits: int
+
+    # Private Instance Attributes:
+    #   - _size: The number of layouts kept
+    #   - _layouts: A mapping from each path to its layout, from the least to the most recently used
+    #   - _lock: Held while _layouts is used
+
+    _size: int
+    _layouts: OrderedDict[tuple[str, ...], dict[str, tuple[float, float]]]
+    _lock: threading.Lock
+
+    def __init__(self, size: int = LAYOUT_CACHE_SIZE) -> None:
+        """
+        Initializes an empty cache that keeps the layouts of the size most recently laid out paths
+
+        Preconditions:
+            - size > 0
+        """
+        self.hits = 0
+        self._size = size
+        self._layouts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_layout(self, graph: nx.Graph) -> dict[str, tuple[float, float]]:
+        """
+        Return the layout of graph, as made by layout_graph. It is taken from the cache if graph's path was laid out
+        before with the same nodes.
+
+        >>> cache = LayoutCache()
+        >>> graph = nx.path_graph(['a', 'b', 'c'])
+        >>> graph.graph['path'] = ['a', 'b', 'c']
+        >>> cache.get_layout(graph) is cache.get_layout(graph)
+        True
+        >>> cache.hits
+        1
+        """
+        key = tuple(graph.graph.get('path', ()))
+        with self._lock:
+            layout = self._layouts.get(key)
+            if layout is not None and all(node in layout for node in graph.nodes):
+                self._layouts.move_to_end(key)
+                self.hits += 1
+                return layout
+
+        layout = layout_graph(graph)
+
+        with self._lock:
+            self._layouts[key] = layout
+            self._layouts.move_to_end(key)
+            while len(self._layouts) > self._size:
+                self._layouts.popitem(last=False)
+        return layout
+
+
+def layout_graph(graph: nx.Graph) -> dict[str, tuple[float, float]]:
+    """
+    Return the positions of the nodes of graph, as described at the top of this file. Graphs without a path are given a
+    spring layout.
+    """
+    if len(graph.graph.get('path', [])) == 0:
+        return {node: tuple(position) for node, position in nx.spring_layout(graph, seed=0).items()}
+
+    positions = path_layout(graph)
+    if graph.number_of_nodes() > SPRING_NODE_LIMIT:
+        return positions
+
+    path_nodes = [node for node in graph.graph['path'] if node in graph]
+    relaxed = nx.spring_layout(graph, k=BRANCH_HEIGHT, pos=positions, fixed=path_nodes, iterations=SPRING_ITERATIONS,
+                               seed=0)
+    return {node: (float(position[0]), float(position[1])) for node, position in relaxed.items()}
+
+
+def path_layout(graph: nx.Graph) -> dict[str, tuple[float, float]]:
+    """
+    Return the positions of the nodes of graph along its path, which runs in rows of ROW_LENGTH nodes, alternately
+    from left to right and from right to left. The nodes branching off each node of the path are fanned out above and
+    below it. Nodes not adjacent to the path are put after its end.
+
+    >>> graph = nx.Graph([('a', 'b'), ('a', 'x'), ('a', 'y')])
+    >>> graph.graph['path'] = ['a', 'b']
+    >>> path_layout(graph) == {'a': (0.0, 0.0), 'b': (1.0, 0.0), 'x': (-0.15, 0.6), 'y': (0.15, -0.6)}
+    True
+    >>> graph = nx.path_graph(range(ROW_LENGTH + 1))
+    >>> graph.graph['path'] = list(range(ROW_LENGTH + 1))
+    >>> path_layout(graph)[ROW_LENGTH] == (ROW_LENGTH - 1, -ROW_GAP)
+    True
+    """
+    path = graph.graph['path']
+    positions = {}
+    for index, node in enumerate(path):
+        row, column = divmod(index, ROW_LENGTH)
+        if row % 2 == 1:
+            column = ROW_LENGTH - 1 - column
+        positions[node] = (float(column), -row * ROW_GAP)
+
+    for node in path:
+        if node not in graph:
+            continue
+        node_x, node_y = positions[node]
+        branches = [adjacent for adjacent in graph.adj[node] if adjacent not in positions]
+        for branch_index, branch in enumerate(branches):
+            x = node_x + (branch_index - (len(branches) - 1) / 2) * BRANCH_SPREAD
+            y = node_y + (1 + branch_index // 2) * BRANCH_HEIGHT * (1 if branch_index % 2 == 0 else -1)
+            positions[branch] = (round(x, 6), round(y, 6))
+
+    end_x, end_y = positions[path[-1]]
+    for node in graph.nodes:
+        if node not in positions:
+            positions[node] = (end_x + 1, end_y)
+
+    return positions
+
+
+def draw_graph(plot: Axes, graph: nx.Graph, positions: dict[str, tuple[float, float]]) -> None:
+    """
+    Clear plot, then draw graph on it with its nodes at positions, coloured by their color attributes and labelled
+    with their names
+    """
+    plot.clear()
+    plot.axis('off')
+    colours = [graph.nodes[node].get('color', 'bisque') for node in graph.nodes]
+    nx.draw(graph, positions, node_color=colours, ax=plot, with_labels=True, font_size=8)
+
+    x_min, x_max = plot.get_xlim()
+    y_min, y_max = plot.get_ylim()
+    padding = PADDING * max(x_max - x_min, y_max - y_min)
+    plot.set_xlim(x_min - padding, x_max + padding)
+    plot.set_ylim(y_min - padding, y_max + padding)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'disable': ['E1136'],
+        'extra-imports': ['threading', 'collections', 'networkx', 'matplotlib.axes'],
+        'allowed-io': [],
+        'max-nested-blocks': 4
+    })
@@ -10,15 +10,24 @@ as is or modified is firmly prohibited.
 
 This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
 """
+import queue
+import threading
 import time
 from tkinter.font import Font
 from tkinter import Tk, Frame, Label, Button, OptionMenu, Text, StringVar, Entry
 import tkinter as tk
+from collections.abc import Callable
 from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import networkx as nx
 import graph_processing as gp
+import graph_rendering
+
+# The number of seconds a search may run before it is given up on
+SEARCH_TIMEOUT = 60
+
+# The number of milliseconds between checks for messages from the search running in the background
+POLL_INTERVAL = 50
 
 
 class Memory():
@@ -60,6 +69,14 @@ class App():
         db_path: the path to the database file
         mem: memory object, holds important widgets
     """
+    # Private Instance Attributes:
+    #   - _generation: The number of searches started or cancelled so far. Messages from any search but the latest are
+    #                  ignored, so a new search supersedes the one before it.
+    #   - _token: The token cancelling the search running in the background, or None if there isn't one
+    #   - _messages: The messages posted by the searches running in the background, as tuples of the generation of the
+    #                search, the kind of message, and its contents
+    #   - _layouts: The layouts of the graphs of the most recently shown paths
+
     root: Tk
     font: Font
     dimensions: tuple[int, int]
@@ -67,8 +84,16 @@ class App():
     filters: list[StringVar]
     db_path: str
     mem: Memory
+    _generation: int
+    _token: gp.CancellationToken | None
+    _messages: queue.Queue
+    _layouts: graph_rendering.LayoutCache
 
-    def __init__(self, path: str) -> None:
+    def __init__(self, path: str, query_log: str = '') -> None:
+        """
+        Initializes the window for the graph database at path. If query_log is given, every search is recorded to the
+        query log file at query_log.
+        """
         self.root = Tk()
         self.root.title("Created by Tai Poole, Nabhan Rashid, and Danny Tran")
         screen_width = self.root.winfo_screenwidth()
@@ -81,19 +106,26 @@ class App():
         self.db_path = path
         self.names = []
         self.filters = []
+        self._generation = 0
+        self._token = None
+        self._messages = queue.Queue()
 
         self.init_input(self.root)
         (dbg, graph) = self.init_display(self.root)
 
-        fig = Figure(figsize=(20, 20), dpi=100)
+        graph_w, graph_h = self.dimensions[0] * 2 / 3 - 30, self.dimensions[1] * 10 / 11 - 30
+        fig = Figure(figsize=(graph_w / 100, graph_h / 100), dpi=100)
+        fig.add_axes((0, 0, 1, 1)).axis('off')
         canvas = FigureCanvasTkAgg(fig, master=graph)
-        g = gp.ShortestActorGraph(self.db_path)
+        self._layouts = graph_rendering.LayoutCache()
+        g = gp.ShortestActorGraph(self.db_path, query_log=gp.QueryLog(query_log) if query_log != '' else None)
         self.mem = Memory((dbg, graph, canvas, fig, g))
 
     def run(self) -> None:
         """
         Runs the application
         """
+        self.root.after(POLL_INTERVAL, self.poll_search)
         self.root.mainloop()
 
     def init_input(self, main_frame: Tk) -> None:
@@ -132,12 +164,15 @@ class App():
         field_frame = Frame(input_frame, bd=15, bg="#ced4da")
         search_button = Button(input_frame, bg="#ced4da", bd=0,
                                command=self.find_connection, font=self.font, text="Go!")
+        cancel_button = Button(input_frame, bg="#ced4da", bd=0,
+                               command=self.cancel_search, font=self.font, text="Cancel")
 
         self.init_name1(field_frame)
         self.init_name2(field_frame)
         self.init_filters(field_frame)
 
         search_button.pack(side=tk.BOTTOM, expand=True, fill=tk.BOTH)
+        cancel_button.pack(side=tk.BOTTOM, fill=tk.BOTH)
         field_frame.pack(fill=tk.BOTH, expand=True)
 
     def init_name1(self, field_frame: Frame) -> None:
@@ -254,6 +289,9 @@ class App():
         """
         Finds the connection between two actors, and displays it on the graph window.
         Uses graph_processing for the backend
+
+        The search runs on a background thread, so the window stays responsive. Any search still running is cancelled,
+        as this one supersedes it.
         """
         name1, name2 = self.names[0].get().title(), self.names[1].get().title()
         is_alive, released_after = self.filters[0].get(), self.filters[1].get()
@@ -261,74 +299,148 @@ class App():
             released_after = int(released_after)
         except ValueError:
             released_after = 0
-        self.mem.dbg.config(state=tk.NORMAL)
-        self.mem.dbg.delete('1.0', tk.END)
-        self.mem.dbg.insert(tk.END, "Searching...")
-        self.mem.dbg.config(state=tk.DISABLED)
-        self.mem.dbg.update()
-        id1, id2 = self.mem.g.get_actor_id(name1), self.mem.g.get_actor_id(name2)
+
+        if self._token is not None:
+            self._token.cancel()
+        self._generation += 1
+        self._token = gp.CancellationToken()
+        self.write_dbg("Searching...")
+
+        worker = threading.Thread(target=self.search, daemon=True,
+                                  args=(self._generation, self._token, (name1, name2), (is_alive, released_after)))
+        worker.start()
+
+    def cancel_search(self) -> None:
+        """
+        Cancels the search running in the background, if there is one
+        """
+        if self._token is not None:
+            self._token.cancel()
+            self._token = None
+            self._generation += 1
+            self.write_dbg("Search cancelled")
+
+    def search(self, generation: int, token: gp.CancellationToken, names: tuple[str, str],
+               filters: tuple[str, int]) -> None:
+        """
+        Searches for the connection between the actors with the given names, and lays out its graph. Runs on a
+        background thread, so it never touches the window. It posts its progress and result to _messages instead, for
+        poll_search to show.
+        """
+        def post(kind: str, contents: object) -> None:
+            self._messages.put((generation, kind, contents))
+
+        try:
+            self._search(names, filters, token, post)
+        except Exception as error:
+            post('done', f"The search failed: {error}")
+            raise
+
+    def _search(self, names: tuple[str, str], filters: tuple[str, int], token: gp.CancellationToken,
+                post: Callable[[str, object], None]) -> None:
+        """
+        Runs the search described in search, posting messages with post
+        """
+        name1, name2 = names
+        is_alive, released_after = filters
+        name_stats = gp.SearchStats()
+        id1 = self.mem.g.get_actor_id(name1, stats=name_stats)
+        id2 = self.mem.g.get_actor_id(name2, stats=name_stats)
         start_time = time.time()
         if id1[0:2] == "nm" and id2[0:2] == "nm":
             # I'd like to note that 1888 is the oldest "movie" in the processed data set. Though it's a book?
+            limits = gp.SearchLimits(timeout=SEARCH_TIMEOUT, token=token, on_progress=lambda depth, visited: post(
+                'progress', f"Searching... at depth {depth}, having visited {visited} actors and movies"))
             if is_alive == 'Any' and released_after < 1888:
-                path = self.mem.g.get_path(id1, id2)
+                result = self.mem.g.find_path(id1, id2, limits)
             else:
-                path = self.mem.g.get_restricted_path(id1, id2, is_alive, released_after=released_after)
-            if len(path) > 0:
-                info = self.mem.g.make_networkx_graph(path)
+                result = self.mem.g.find_restricted_path(id1, id2, is_alive, released_after=released_after,
+                                                         limits=limits)
+            path = result.path
+            stats = result.stats
+            stats.add(name_stats)
+            if result.status == gp.CUT_OFF and result.cut_off_reason == 'cancelled':
+                post('done', "Search cancelled")
+            elif result.status == gp.CUT_OFF:
+                post('done', f"Gave up after {SEARCH_TIMEOUT} seconds, having searched {stats.visited} actors and "
+                             f"movies\n{describe_stats(stats)}")
+            elif len(path) > 0:
+                info = self.mem.g.make_networkx_graph(path, stats)
+                layout_start, layout_hits = time.perf_counter(), self._layouts.hits
+                pos = self._layouts.get_layout(info)
+                stats.layout_time += time.perf_counter() - layout_start
+                stats.cache_hits += self._layouts.hits - layout_hits
                 wait = round(time.time() - start_time, 3)
-
-                self.mem.dbg.config(state=tk.NORMAL)
-                self.mem.dbg.delete('1.0', tk.END)
                 d = int((len(path) - 1) / 2)
                 p = "s" if d != 1 else ""
                 msg = f"Found a connection in {wait} seconds and {d} degree{p} of seperation"
-                self.mem.dbg.insert(tk.END, msg)
-                self.mem.dbg.config(state=tk.DISABLED)
-                self.render(info)
+                post('found', (info, pos, stats, msg))
             else:
-                self.mem.dbg.config(state=tk.NORMAL)
-                self.mem.dbg.delete('1.0', tk.END)
-                self.mem.dbg.insert(tk.END, "No connection found :(")
-                self.mem.dbg.config(state=tk.DISABLED)
+                post('done', f"No connection found :(\n{describe_stats(stats)}")
+        elif id1 == "tm":
+            post('done', f"Sorry, there are too many actors named {name1} ")
+        elif id2 == "tm":
+            post('done', f"Sorry, there are too many actors named {name2}")
         else:
-            self.mem.dbg.config(state=tk.NORMAL)
-            self.mem.dbg.delete('1.0', tk.END)
-            if id1 == "tm":
-                self.mem.dbg.insert(tk.END, f"Sorry, there are too many actors named {name1} ")
-            elif id2 == "tm":
-                self.mem.dbg.insert(tk.END, f"Sorry, there are too many actors named {name2}")
-            else:
-                self.mem.dbg.insert(tk.END,
-                                    f"Sorry, actor {name1 if id1 == "" else name2 if id2 == "" else ""} not found")
-            self.mem.dbg.config(state=tk.DISABLED)
+            post('done', f"Sorry, actor {name1 if id1 == "" else name2 if id2 == "" else ""} not found")
 
-    def render(self, info: nx.Graph) -> None:
+    def poll_search(self) -> None:
         """
-        Renders the graph
+        Shows the messages posted by the latest search since the last poll, then polls again after POLL_INTERVAL
+        milliseconds. Messages from superseded or cancelled searches are dropped.
         """
-        # DO NOT TOUCH ANYTHING IT HAS DRIVEN ME MAD ON THE ROCKS
-        self.mem.canvas.get_tk_widget().pack_forget()
-        plt.close(self.mem.fig)
-        graph_w, graph_h = self.dimensions[0] * 2 / 3 - 30, self.dimensions[1] * 10 / 11 - 30
-        self.mem.fig = Figure(figsize=(graph_w / 100, graph_h / 100), dpi=100)
-        plot = self.mem.fig.add_axes((0, 0, 1, 1))
-        plot.axis('off')
-        pos = nx.kamada_kawai_layout(info)
-        colours = [info.nodes[k]['color'] for k in info.nodes]
-        nx.draw(info, pos, node_color=colours, ax=plot, with_labels=True, font_size=8)
-        x_min, x_max = plot.get_xlim()
-        y_min, y_max = plot.get_ylim()
-        x_span = x_max - x_min
-        y_span = y_max - y_min
-        padding = 0.05 * max(x_span, y_span)
-        plot.set_xlim(x_min - padding, x_max + padding)
-        plot.set_ylim(y_min - padding, y_max + padding)
-        self.mem.canvas = FigureCanvasTkAgg(self.mem.fig, master=self.mem.graph)
-        self.mem.canvas.draw()
+        try:
+            while True:
+                generation, kind, contents = self._messages.get_nowait()
+                if generation != self._generation:
+                    continue
+
+                if kind == 'found':
+                    info, pos, stats, msg = contents
+                    self.render(info, pos, stats)
+                    self.write_dbg(f"{msg}\n{describe_stats(stats)}")
+                else:
+                    self.write_dbg(contents)
+
+                if kind != 'progress':
+                    self._token = None
+        except queue.Empty:
+            pass
+
+        self.root.after(POLL_INTERVAL, self.poll_search)
+
+    def write_dbg(self, text: str) -> None:
+        """
+        Replaces the text of the debug frame with text
+        """
+        self.mem.dbg.config(state=tk.NORMAL)
+        self.mem.dbg.delete('1.0', tk.END)
+        self.mem.dbg.insert(tk.END, text)
+        self.mem.dbg.config(state=tk.DISABLED)
+
+    def render(self, info: nx.Graph, pos: dict, stats: gp.SearchStats | None = None) -> None:
+        """
+        Renders the graph with its nodes at the positions in pos, adding the time taken to draw it to stats if given.
+        The same figure and canvas are drawn on every time.
+        """
+        draw_start = time.perf_counter()
+        graph_rendering.draw_graph(self.mem.fig.axes[0], info, pos)
+        self.mem.canvas.draw_idle()
+        if stats is not None:
+            stats.layout_time += time.perf_counter() - draw_start
         self.mem.canvas.get_tk_widget().pack()
 
 
+def describe_stats(stats: gp.SearchStats) -> str:
+    """
+    Return a summary of what a query cost, for the debug frame
+    """
+    return (f"Expanded {stats.nodes_expanded} nodes ({stats.neighbours_scanned} neighbours), peak frontier "
+            f"{stats.peak_frontier}, visited {stats.visited}. {stats.sql_queries} SQL queries on "
+            f"{stats.connections_opened} connections, {stats.cache_hits} cache hits. Search {stats.search_time:.3f}s, "
+            f"names {stats.name_time:.3f}s, layout {stats.layout_time:.3f}s")
+
+
 if __name__ == "__main__":
     # import python_ta
     # python_ta.check_all(config={
@@ -1,5 +1,9 @@
 """
-The main file, where anything necessary will be run. This will likely be mostly the tkinter call
+The main file, where anything necessary will be run. With no arguments this opens the tkinter window, and with any
+arguments it runs the command line interface in cli.py instead
+
+If the QUERY_LOG environment variable is set, the searches made in the window are recorded to the query log file it
+names, for replay.py to run again.
 
 Copyright and Usage Information
 ===============================
@@ -10,8 +14,14 @@ as is or modified is firmly prohibited.
 This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
 
 """
-import gui_interface
+import os
+import sys
 
 if __name__ == '__main__':
-    app = gui_interface.App("./data_files/actors_and_movies.db")
-    app.run()
+    if len(sys.argv) > 1:
+        import cli
+        sys.exit(cli.main())
+    else:
+        import gui_interface
+        app = gui_interface.App("./data_files/actors_and_movies.db", os.environ.get('QUERY_LOG', ''))
+        app.run()
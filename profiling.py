@@ -0,0 +1,345 @@
+"""
+Module Description
+==================
+A file with an opt in profiling mode for finding out why a search or a step of building the database is slow, without
+changing any code. It is off by default, and costs next to nothing while off.
+
+Profiling is turned on by calling enable, or by setting the PROFILE_DIRECTORY environment variable to the directory to
+write reports to before the program starts. While it is on, each search run by graph_processing and each step of
+building the database in sql_processing is profiled as a stage:
+    - cProfile records the time spent in every function called, which is saved as a .prof file that pstats or a viewer
+      such as snakeviz can open
+    - tracemalloc records the memory allocated during the stage, by the line that allocated it, unless memory profiling
+      is turned off
+    - a trace callback on each database connection records every SQL statement run, with the time until the next
+      statement starts or the stage ends, which includes the time spent on the statement's rows
+
+A text report of each stage is written alongside its .prof file, labelled with the search or step it profiled. To keep
+only the reports of slow stages, enable can be given slowest, or the PROFILE_SLOWEST environment variable set to, the
+percentage of stages to keep. A stage is then kept if it is among the slowest that percentage of the last
+DURATION_WINDOW stages, so a long running program only remembers a bounded number of them.
+
+Stages can be run on several threads at once, but only one profiler can run at a time, so a stage that starts while
+another is being profiled is reported without the functions it called. The memory of stages running at the same time
+is also mixed together, since tracemalloc traces the whole program.
+
+Copyright and Usage Information
+===============================
+This file is solely provided for the use in grading and review of the named student's
+work by the TAs and Professors of CSC111. All further distribution of this code whether
+as is or modified is firmly prohibited.
+
+This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
+"""
+from __future__ import annotations
+import cProfile
+import io
+import os
+import pstats
+import re
+import sqlite3 as sql
+import threading
+import time
+import tracemalloc
+from collections import deque
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any
+
+# The environment variables that turn profiling on when the program starts
+DIRECTORY_VARIABLE = 'PROFILE_DIRECTORY'
+SLOWEST_VARIABLE = 'PROFILE_SLOWEST'
+
+# The number of functions, allocating lines, and SQL statements listed in each report
+REPORT_LENGTH = 25
+
+# The longest a label can be in the name of a report's files
+LABEL_LENGTH = 80
+
+# The number of the most recent stages a stage is compared to when deciding whether it is among the slowest
+DURATION_WINDOW = 1000
+
+
+class _Settings:
+    """
+    The settings of the profiling mode, shared by every thread
+
+    Instance Attributes:
+        - directory: The directory reports are written to, or an empty string if profiling is off
+        - slowest: The percentage of the slowest stages whose reports are kept
+        - memory: Whether the memory allocated during each stage is recorded
+        - durations: The number of seconds each of the last DURATION_WINDOW stages profiled took
+        - reports: The number of reports written so far
+        - lock: Held while durations or reports are used
+    """
+    directory: str
+    slowest: float
+    memory: bool
+    durations: deque[float]
+    reports: int
+    lock: threading.Lock
+
+    def __init__(self) -> None:
+        self.directory = ''
+        self.slowest = 100.0
+        self.memory = True
+        self.durations = deque(maxlen=DURATION_WINDOW)
+        self.reports = 0
+        self.lock = threading.Lock()
+
+
+class _Stage:
+    """
+    A stage being profiled, on the thread running it
+
+    Instance Attributes:
+        - label: What the stage is, such as the search it runs
+        - profile: The profiler recording the functions called during the stage, or None if another stage has it
+        - snapshot: The memory allocated when the stage started, or None if memory isn't recorded
+        - statements: A mapping from each SQL statement run to the number of times it was run and the seconds it took
+        - last_statement: The SQL statement run most recently, or an empty string if there hasn't been one
+        - last_time: When last_statement started
+    """
+    label: str
+    profile: cProfile.Profile | None
+    snapshot: tracemalloc.Snapshot | None
+    statements: dict[str, list[float]]
+    last_statement: str
+    last_time: float
+
+    def __init__(self, label: str, profile: cProfile.Profile | None, snapshot: tracemalloc.Snapshot | None) -> None:
+        self.label = label
+        self.profile = profile
+        self.snapshot = snapshot
+        self.statements = {}
+        self.last_statement = ''
+        self.last_time = 0.0
+
+    def finish_statement(self, now: float) -> None:
+        """
+        Add the time from when the last statement started until now to it
+        """
+        if self.last_statement != '':
+            timing = self.statements.setdefault(self.last_statement, [0, 0.0])
+            timing[0] += 1
+            timing[1] += now - self.last_time
+            self.last_statement = ''
+
+
+_SETTINGS = _Settings()
+_LOCAL = threading.local()
+
+# Held while a stage is being profiled by cProfile, since only one profiler can run at a time
+_PROFILER_LOCK = threading.Lock()
+
+
+def enable(directory: str, slowest: float = 100.0, memory: bool = True) -> None:
+    """
+    Turn profiling on, writing reports to directory, which is created if it doesn't exist. Only the reports of the
+    slowest percentage of stages are kept. If memory is False, the memory allocated during each stage isn't recorded,
+    which makes profiling much faster.
+
+    Preconditions:
+        - directory != ''
+        - 0 < slowest <= 100
+    """
+    os.makedirs(directory, exist_ok=True)
+    with _SETTINGS.lock:
+        _SETTINGS.directory = directory
+        _SETTINGS.slowest = slowest
+        _SETTINGS.memory = memory
+        _SETTINGS.durations = deque(maxlen=DURATION_WINDOW)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable() -> None:
+    """
+    Turn profiling off. Stages that are already being profiled still write their reports.
+    """
+    with _SETTINGS.lock:
+        _SETTINGS.directory = ''
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled() -> bool:
+    """
+    Return whether profiling is on
+    """
+    return _SETTINGS.directory != ''
+
+
+@contextmanager
+def stage(*label_parts: Any) -> Iterator[None]:
+    """
+    Profile the with block as a stage labelled with label_parts, if profiling is on. Stages inside another stage on
+    the same thread are profiled as part of it.
+    """
+    if not is_enabled() or getattr(_LOCAL, 'stage', None) is not None:
+        yield
+        return
+
+    label = '-'.join(str(part) for part in label_parts)
+    profile = cProfile.Profile() if _PROFILER_LOCK.acquire(blocking=False) else None
+    current = _Stage(label, profile, tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None)
+    _LOCAL.stage = current
+    start_time = time.perf_counter()
+    if profile is not None:
+        profile.enable()
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+            _PROFILER_LOCK.release()
+        duration = time.perf_counter() - start_time
+        current.finish_statement(time.perf_counter())
+        _LOCAL.stage = None
+        _finish_stage(current, duration)
+
+
+def profiled(function: Callable) -> Callable:
+    """
+    Return function, profiled as a stage labelled with its name whenever it is called
+
+    >>> @profiled
+    ... def double(number: int) -> int:
+    ...     return number * 2
+    >>> double(2)
+    4
+    """
+    @wraps(function)
+    def profiled_function(*args: Any, **kwargs: Any) -> Any:
+        with stage(function.__name__):
+            return function(*args, **kwargs)
+
+    return profiled_function
+
+
+def trace(connection: sql.Connection) -> sql.Connection:
+    """
+    Record the SQL statements run on connection in the stages they are run in, if profiling is on, and return
+    connection
+    """
+    if is_enabled():
+        connection.set_trace_callback(record_statement)
+    return connection
+
+
+def record_statement(statement: str) -> None:
+    """
+    Record that statement started running on this thread, if it is running in a stage
+    """
+    current = getattr(_LOCAL, 'stage', None)
+    if current is not None:
+        now = time.perf_counter()
+        current.finish_statement(now)
+        current.last_statement = statement_shape(statement)
+        current.last_time = now
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Return statement with its values replaced by ?, and lists of values by a single list, so the same statement run
+    with different values is recorded together
+
+    >>> statement_shape("SELECT name FROM actor WHERE actor_id IN ('nm1', 'nm2') AND birthYear > 1950")
+    'SELECT name FROM actor WHERE actor_id IN (?, ...) AND birthYear > ?'
+    """
+    statement = re.sub(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b", '?', ' '.join(statement.split()))
+    return re.sub(r'\(\?(?:, \?)*\)', '(?, ...)', statement)
+
+
+def _finish_stage(current: _Stage, duration: float) -> None:
+    """
+    Write the reports of current, which took duration seconds, if it is among the slowest stages
+    """
+    with _SETTINGS.lock:
+        directory = _SETTINGS.directory
+        _SETTINGS.durations.append(duration)
+        if directory == '' or not _is_slowest(duration, _SETTINGS.durations, _SETTINGS.slowest):
+            return
+        _SETTINGS.reports += 1
+        report_number = _SETTINGS.reports
+
+    memory = []
+    if current.snapshot is not None and tracemalloc.is_tracing():
+        ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        memory = tracemalloc.take_snapshot().filter_traces(ignored).compare_to(
+            current.snapshot.filter_traces(ignored), 'lineno')
+
+    file_name = os.path.join(directory, f'{os.getpid()}-{report_number:05d}-{_file_label(current.label)}')
+    if current.profile is not None:
+        current.profile.dump_stats(file_name + '.prof')
+    with open(file_name + '.txt', 'w', encoding='UTF-8') as file:
+        file.write(_describe_stage(current, duration, memory))
+
+
+def _is_slowest(duration: float, durations: deque[float], slowest: float) -> bool:
+    """
+    Return whether a stage that took duration seconds is among the slowest percentage of the stages that took
+    durations, which include it
+
+    >>> window = deque([float(seconds) for seconds in range(1, 101)])
+    >>> [_is_slowest(95.0, window, 10), _is_slowest(90.0, window, 10), _is_slowest(1.0, window, 100)]
+    [True, False, True]
+    """
+    if slowest >= 100:
+        return True
+    return sum(1 for other in durations if other > duration) < len(durations) * slowest / 100
+
+
+def _describe_stage(current: _Stage, duration: float, memory: list[tracemalloc.StatisticDiff]) -> str:
+    """
+    Return the text report of current, which took duration seconds and allocated memory, by line
+    """
+    report = io.StringIO()
+    report.write(f"{current.label}\nTook {duration:.6f} seconds\n\n")
+
+    if current.profile is not None:
+        report.write("Functions, by cumulative time\n")
+        pstats.Stats(current.profile, stream=report).sort_stats('cumulative').print_stats(REPORT_LENGTH)
+
+    if len(memory) > 0:
+        report.write("Memory allocated, by line\n")
+        for difference in memory[:REPORT_LENGTH]:
+            report.write(f"{difference}\n")
+        report.write("\n")
+
+    report.write("SQL statements, by total time\n")
+    statements = sorted(current.statements.items(), key=lambda item: item[1][1], reverse=True)
+    for statement, (count, seconds) in statements[:REPORT_LENGTH]:
+        report.write(f"{seconds:12.6f} s {int(count):8d} runs  {statement}\n")
+
+    return report.getvalue()
+
+
+def _file_label(label: str) -> str:
+    """
+    Return label with every character that can't be in a file name replaced, shortened to LABEL_LENGTH characters
+
+    >>> _file_label('path-nm0000138-nm0000206/2')
+    'path-nm0000138-nm0000206_2'
+    """
+    return re.sub(r'[^\w.-]', '_', label)[:LABEL_LENGTH]
+
+
+if os.environ.get(DIRECTORY_VARIABLE, '') != '':
+    enable(os.environ[DIRECTORY_VARIABLE], float(os.environ.get(SLOWEST_VARIABLE, '100')))
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'disable': ['E1136'],
+        'extra-imports': ['cProfile', 'io', 'os', 'pstats', 're', 'sqlite3', 'threading', 'time', 'tracemalloc',
+                          'collections', 'collections.abc', 'contextlib', 'functools', 'typing'],
+        'allowed-io': ['_finish_stage'],
+        'max-nested-blocks': 4
+    })
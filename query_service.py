@@ -0,0 +1,515 @@
+"""
+Module Description
+==================
+A file with a local HTTP service that answers queries on a graph database made by sql_processing with JSON, so the
+graph can be searched by other programs, or from behind a load balancer, instead of only through the GUI.
+
+The service reads requests and writes responses on an asyncio event loop. Looking up actors and searching block, so
+they are handed to a pool of worker threads, each of which holds its own read only ShortestActorGraph. At most
+max_pending requests may be waiting for or being handled by a worker at once. Any more are turned away straight away
+with a 503 response, rather than being queued without bound, so a busy service tells the load balancer to try
+elsewhere instead of falling further and further behind.
+
+Every endpoint takes its parameters in the query string of a GET request, and responds with a JSON object:
+    - /actor?name=...&played_in=...: The id of the actor with the given name, optionally in the given movie
+    - /path?actor1=...&actor2=...: The shortest path between two actor ids, with the names along it
+    - /paths?actor1=...&targets=...: The shortest path from an actor id to each of a comma separated list of actor ids,
+      found with a single search, keyed by target
+    - /restricted_path?actor1=...&actor2=...&alive=...&before=...&after=...: The shortest restricted path between two
+      actor ids, with the restrictions of ShortestActorGraph.get_restricted_path
+    - /graph?path=...: The nodes and edges of the graph the GUI draws for a comma separated path of ids
+    - /metrics: The number of requests and their throughput, and histograms of their latencies, by endpoint
+
+Searches may also be given max_expansions and timeout, which limit them as SearchLimits does. A search cut off by them
+is still a successful request, with the status 'cut off'.
+
+Copyright and Usage Information
+===============================
+This file is solely provided for the use in grading and review of the named student's
+work by the TAs and Professors of CSC111. All further distribution of this code whether
+as is or modified is firmly prohibited.
+
+This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import parse_qsl, urlsplit
+import graph_processing as gp
+
+# The address the service listens on by default. It is only reachable from this machine unless told otherwise.
+HOST = '127.0.0.1'
+PORT = 8111
+
+# The default number of worker threads, and of requests that may be waiting for or being handled by them at once
+WORKER_COUNT = 4
+MAX_PENDING = 64
+
+# The default number of seconds a search may run for, if the request doesn't give a timeout
+SEARCH_TIMEOUT = 30
+
+# The number of seconds an idle connection is kept open for, and the largest request head and body accepted in bytes
+IDLE_TIMEOUT = 15
+MAX_HEAD_SIZE = 16 * 1024
+MAX_BODY_SIZE = 64 * 1024
+
+# The upper bounds, in seconds, of the buckets of the latency histograms
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """
+    A histogram of how long requests took to answer.
+
+    Instance Attributes:
+        - bounds: The upper bound of each bucket in seconds, in increasing order
+        - counts: The number of latencies in each bucket, with one more bucket at the end for latencies past every bound
+        - total: The number of seconds of every latency recorded, added up
+
+    Representation Invariants:
+        - len(self.counts) == len(self.bounds) + 1
+    """
+    bounds: tuple[float, ...]
+    counts: list[int]
+    total: float
+
+    def __init__(self, bounds: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def record(self, seconds: float) -> None:
+        """
+        Add a latency of seconds to the histogram
+
+        >>> histogram = LatencyHistogram((0.1, 1.0))
+        >>> histogram.record(0.5)
+        >>> histogram.record(2.0)
+        >>> histogram.counts
+        [0, 1, 1]
+        """
+        bucket = 0
+        while bucket < len(self.bounds) and seconds > self.bounds[bucket]:
+            bucket += 1
+        self.counts[bucket] += 1
+        self.total += seconds
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Return the histogram as a dictionary. Like a Prometheus histogram, each bucket counts every latency at or under
+        its bound, so the last bucket, '+Inf', counts every latency.
+
+        >>> histogram = LatencyHistogram((0.1, 1.0))
+        >>> histogram.record(0.05)
+        >>> histogram.record(0.5)
+        >>> histogram.as_dict()['buckets']
+        {'0.1': 1, '1.0': 2, '+Inf': 2}
+        """
+        buckets = {}
+        count = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            count += bucket_count
+            buckets[str(bound)] = count
+        buckets['+Inf'] = count + self.counts[-1]
+        return {'count': buckets['+Inf'], 'sum': self.total, 'buckets': buckets}
+
+
+class ServiceMetrics:
+    """
+    The throughput and latencies of the requests a QueryService has answered. The metrics are only changed by the
+    event loop's thread, so they don't need a lock.
+
+    Instance Attributes:
+        - started: The time.monotonic() time the metrics were started at
+        - responses: A mapping from each endpoint to a mapping from the status codes of its responses to their number
+        - latencies: A mapping from each endpoint to the histogram of its latencies
+        - rejected: The number of requests turned away because too many were pending
+        - pending: The number of requests waiting for or being handled by a worker
+        - peak_pending: The largest number of requests that were pending at once
+    """
+    started: float
+    responses: dict[str, dict[int, int]]
+    latencies: dict[str, LatencyHistogram]
+    rejected: int
+    pending: int
+    peak_pending: int
+
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.responses = {}
+        self.latencies = {}
+        self.rejected = 0
+        self.pending = 0
+        self.peak_pending = 0
+
+    def record(self, endpoint: str, status: int, seconds: float) -> None:
+        """
+        Record a response with the given status code to a request to endpoint that took seconds to answer
+        """
+        statuses = self.responses.setdefault(endpoint, {})
+        statuses[int(status)] = statuses.get(int(status), 0) + 1
+        self.latencies.setdefault(endpoint, LatencyHistogram()).record(seconds)
+
+    def as_dict(self) -> dict[str, Any]:
+        """
+        Return the metrics as a dictionary, ready to be turned into JSON. The throughput is the number of requests
+        answered per second since the metrics were started.
+        """
+        uptime = time.monotonic() - self.started
+        total = sum(sum(statuses.values()) for statuses in self.responses.values())
+        return {
+            'uptime': uptime,
+            'requests': total,
+            'throughput': total / uptime if uptime > 0 else 0.0,
+            'rejected': self.rejected,
+            'pending': self.pending,
+            'peak_pending': self.peak_pending,
+            'endpoints': {endpoint: {'responses': {str(status): count for status, count in statuses.items()},
+                                     'latency': self.latencies[endpoint].as_dict()}
+                          for endpoint, statuses in self.responses.items()}
+        }
+
+
+class QueryService:
+    """
+    A local HTTP service answering queries on a graph database with JSON. See the module description for its endpoints.
+
+    Instance Attributes:
+        - metrics: The metrics of the requests the service has answered
+    """
+
+    # Private Instance Attributes:
+    #   - _db_path: The file path of the graph database
+    #   - _use_costar: Whether the workers' graphs search unrestricted paths through the costar table
+    #   - _max_pending: The number of requests that may be waiting for or being handled by a worker at once
+    #   - _executor: The pool of worker threads blocking work is run on
+    #   - _local: Holds the graph of each worker thread, named graph
+    #   - _graphs: The graph of every worker thread that has started
+    #   - _graphs_lock: Held while _graphs is changed
+    #   - _handlers: A mapping from each endpoint, other than /metrics, to the method that answers it on a worker
+    #   - _query_log: The log the workers' graphs record every search to, or None if searches aren't recorded
+
+    metrics: ServiceMetrics
+    _db_path: str
+    _use_costar: bool
+    _max_pending: int
+    _executor: ThreadPoolExecutor
+    _local: threading.local
+    _graphs: list[gp.ShortestActorGraph]
+    _graphs_lock: threading.Lock
+    _handlers: dict[str, Callable[[dict[str, str]], tuple[int, dict]]]
+    _query_log: gp.QueryLog | None
+
+    def __init__(self, database_path: str, worker_count: int = WORKER_COUNT, max_pending: int = MAX_PENDING,
+                 use_costar: bool = False, query_log: gp.QueryLog | None = None) -> None:
+        """
+        Initializes the service and its worker_count worker threads, which each open database_path as a read only
+        ShortestActorGraph when they start. use_costar and query_log are given to each of their graphs.
+
+        Preconditions:
+            - database_path refers to a valid sqlite3 database that has at least the tables "actor", "movie", and "edge"
+            - worker_count > 0
+            - max_pending > 0
+        """
+        if not os.path.exists(database_path):
+            raise FileNotFoundError
+        self.metrics = ServiceMetrics()
+        self._db_path = database_path
+        self._use_costar = use_costar
+        self._max_pending = max_pending
+        self._query_log = query_log
+        self._local = threading.local()
+        self._graphs = []
+        self._graphs_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(worker_count, thread_name_prefix='query-worker',
+                                            initializer=self._start_worker)
+        self._handlers = {
+            '/actor': self._lookup_actor,
+            '/path': self._find_path,
+            '/paths': self._find_paths,
+            '/restricted_path': self._find_restricted_path,
+            '/graph': self._describe_graph
+        }
+
+    async def serve(self, host: str = HOST, port: int = PORT) -> None:
+        """
+        Answer requests on host and port until cancelled, then shut down the worker threads
+        """
+        server = await asyncio.start_server(self._handle_connection, host, port, limit=MAX_HEAD_SIZE)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Shut down the worker threads, once they have finished the requests they were given, and close their graphs
+        """
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._graphs_lock:
+            for graph in self._graphs:
+                graph.close()
+            self._graphs = []
+
+    def _start_worker(self) -> None:
+        """
+        Open this worker thread's graph
+        """
+        self._local.graph = gp.ShortestActorGraph(self._db_path, use_costar=self._use_costar, read_only=True,
+                                                  query_log=self._query_log)
+        with self._graphs_lock:
+            self._graphs.append(self._local.graph)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Answer each request sent on a connection, until the client closes it, asks for it to be closed, or leaves it
+        idle for IDLE_TIMEOUT seconds
+        """
+        keep_alive = True
+        try:
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), IDLE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._write_response(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                               {'error': "Request head too large"}, False)
+                    break
+
+                start_time = time.perf_counter()
+                try:
+                    method, target, version, headers = parse_request_head(head)
+                    body_size = int(headers.get('content-length', '0'))
+                except ValueError:
+                    await self._write_response(writer, HTTPStatus.BAD_REQUEST, {'error': "Malformed request"}, False)
+                    break
+                if not 0 <= body_size <= MAX_BODY_SIZE:
+                    await self._write_response(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                               {'error': "Request body too large"}, False)
+                    break
+                await reader.readexactly(body_size)
+
+                connection_header = headers.get('connection', '').lower()
+                if version == 'HTTP/1.0':
+                    keep_alive = connection_header == 'keep-alive'
+                else:
+                    keep_alive = connection_header != 'close'
+
+                endpoint = urlsplit(target).path
+                status, content = await self._respond(method, target)
+                await self._write_response(writer, status, content, keep_alive)
+                self.metrics.record(endpoint if endpoint in self._handlers or endpoint == '/metrics' else 'other',
+                                    status, time.perf_counter() - start_time)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, method: str, target: str) -> tuple[int, dict]:
+        """
+        Return the status code and JSON content of the response to a request to target using method
+        """
+        url = urlsplit(target)
+        if url.path != '/metrics' and url.path not in self._handlers:
+            return HTTPStatus.NOT_FOUND, {'error': f"Unknown endpoint {url.path}"}
+        elif method != 'GET':
+            return HTTPStatus.METHOD_NOT_ALLOWED, {'error': "Only GET requests are supported"}
+        elif url.path == '/metrics':
+            return HTTPStatus.OK, self.metrics.as_dict()
+
+        if self.metrics.pending >= self._max_pending:
+            self.metrics.rejected += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, {'error': "Too many requests are pending, try again later"}
+
+        parameters = dict(parse_qsl(url.query))
+        self.metrics.pending += 1
+        self.metrics.peak_pending = max(self.metrics.peak_pending, self.metrics.pending)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._handlers[url.path],
+                                                                    parameters)
+        except ValueError as error:
+            return HTTPStatus.BAD_REQUEST, {'error': str(error)}
+        except Exception:
+            LOGGER.exception("Failed to answer %s", target)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': "Internal error"}
+        finally:
+            self.metrics.pending -= 1
+
+    @staticmethod
+    async def _write_response(writer: asyncio.StreamWriter, status: int, content: dict, keep_alive: bool) -> None:
+        """
+        Write a response with the given status code and JSON content to writer
+        """
+        body = json.dumps(content).encode('UTF-8')
+        head = (f'HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n'
+                f'Content-Type: application/json\r\n'
+                f'Content-Length: {len(body)}\r\n')
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            head += 'Retry-After: 1\r\n'
+        if not keep_alive:
+            head += 'Connection: close\r\n'
+        writer.write(head.encode('ASCII') + b'\r\n' + body)
+        await writer.drain()
+
+    def _lookup_actor(self, parameters: dict[str, str]) -> tuple[int, dict]:
+        """
+        Answer a request to /actor. Runs on a worker thread.
+        """
+        name = _get_parameter(parameters, 'name')
+        actor_id = self._local.graph.get_actor_id(name, parameters.get('played_in', ''))
+        if actor_id == '':
+            return HTTPStatus.NOT_FOUND, {'error': f"No actor named {name} was found"}
+        elif actor_id == 'tm':
+            return HTTPStatus.CONFLICT, {'error': f"There is more than one actor named {name}"}
+        else:
+            return HTTPStatus.OK, {'id': actor_id, 'name': name}
+
+    def _find_path(self, parameters: dict[str, str]) -> tuple[int, dict]:
+        """
+        Answer a request to /path. Runs on a worker thread.
+        """
+        result = self._local.graph.find_path(_get_parameter(parameters, 'actor1'),
+                                             _get_parameter(parameters, 'actor2'),
+                                             _get_limits(parameters))
+        return HTTPStatus.OK, self._local.graph.describe_result(result)
+
+    def _find_paths(self, parameters: dict[str, str]) -> tuple[int, dict]:
+        """
+        Answer a request to /paths. Runs on a worker thread.
+        """
+        targets = [target for target in _get_parameter(parameters, 'targets').split(',') if target != '']
+        if len(targets) == 0:
+            raise ValueError("targets must have at least one id")
+
+        graph = self._local.graph
+        results = graph.find_paths(_get_parameter(parameters, 'actor1'), targets, _get_limits(parameters))
+        return HTTPStatus.OK, {'paths': {target: graph.describe_result(result) for target, result in results.items()}}
+
+    def _find_restricted_path(self, parameters: dict[str, str]) -> tuple[int, dict]:
+        """
+        Answer a request to /restricted_path. Runs on a worker thread.
+        """
+        alive = parameters.get('alive', 'Any')
+        if alive.lower() not in ('any', 'alive', 'deceased'):
+            raise ValueError("alive must be Any, Alive, or Deceased")
+
+        result = self._local.graph.find_restricted_path(_get_parameter(parameters, 'actor1'),
+                                                        _get_parameter(parameters, 'actor2'),
+                                                        alive,
+                                                        int(parameters.get('before', '9999')),
+                                                        int(parameters.get('after', '0')),
+                                                        _get_limits(parameters))
+        return HTTPStatus.OK, self._local.graph.describe_result(result)
+
+    def _describe_graph(self, parameters: dict[str, str]) -> tuple[int, dict]:
+        """
+        Answer a request to /graph. Runs on a worker thread.
+        """
+        path = [node_id for node_id in _get_parameter(parameters, 'path').split(',') if node_id != '']
+        if len(path) == 0:
+            raise ValueError("path must have at least one id")
+
+        try:
+            nx_graph = self._local.graph.make_networkx_graph(path)
+        except (KeyError, TypeError) as error:
+            raise ValueError("path is not a path in the graph") from error
+
+        return HTTPStatus.OK, {
+            'nodes': [{'name': name, 'color': data.get('color', '')} for name, data in nx_graph.nodes(data=True)],
+            'edges': [list(edge) for edge in nx_graph.edges]
+        }
+
+
+def parse_request_head(head: bytes) -> tuple[str, str, str, dict[str, str]]:
+    """
+    Return the method, target, HTTP version, and headers of an HTTP request whose head is head. The names of the headers
+    are made lowercase.
+
+    Raises a ValueError if head isn't the head of an HTTP/1.0 or HTTP/1.1 request.
+
+    >>> parse_request_head(b'GET /path?actor1=nm1 HTTP/1.1\\r\\nHost: localhost\\r\\n\\r\\n')
+    ('GET', '/path?actor1=nm1', 'HTTP/1.1', {'host': 'localhost'})
+    """
+    lines = head.decode('ISO-8859-1').split('\r\n')
+    request_line = lines[0].split(' ')
+    if len(request_line) != 3 or request_line[2] not in ('HTTP/1.0', 'HTTP/1.1'):
+        raise ValueError("Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        if line == '':
+            continue
+        name, separator, value = line.partition(':')
+        if separator == '':
+            raise ValueError("Malformed header")
+        headers[name.strip().lower()] = value.strip()
+
+    return request_line[0], request_line[1], request_line[2], headers
+
+
+def _get_parameter(parameters: dict[str, str], name: str) -> str:
+    """
+    Return the parameter called name, raising a ValueError if it wasn't given
+    """
+    if parameters.get(name, '') == '':
+        raise ValueError(f"Missing the parameter {name}")
+    return parameters[name]
+
+
+def _get_limits(parameters: dict[str, str]) -> gp.SearchLimits:
+    """
+    Return the limits of a search given by the max_expansions and timeout parameters, with a timeout of SEARCH_TIMEOUT
+    seconds if none is given
+
+    >>> _get_limits({'timeout': '0'})
+    Traceback (most recent call last):
+    ValueError: timeout must be positive
+    >>> _get_limits({'max_expansions': '0'}).max_expansions
+    0
+    """
+    max_expansions = parameters.get('max_expansions', '')
+    timeout = float(parameters.get('timeout', SEARCH_TIMEOUT))
+    if timeout <= 0:
+        raise ValueError("timeout must be positive")
+    elif max_expansions != '' and int(max_expansions) < 0:
+        raise ValueError("max_expansions must not be negative")
+    return gp.SearchLimits(None if max_expansions == '' else int(max_expansions), timeout)
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    parser = argparse.ArgumentParser(description="Answer queries on a graph database over HTTP with JSON")
+    parser.add_argument('database', nargs='?', default='data_files/actors_and_movies.db',
+                        help="the graph database made by sql_processing")
+    parser.add_argument('--host', default=HOST, help="the address to listen on")
+    parser.add_argument('--port', type=int, default=PORT, help="the port to listen on")
+    parser.add_argument('--workers', type=int, default=WORKER_COUNT, help="the number of worker threads")
+    parser.add_argument('--max-pending', type=int, default=MAX_PENDING,
+                        help="the number of requests that may be pending before more are turned away")
+    parser.add_argument('--costar', action='store_true', help="search unrestricted paths through the costar table")
+    parser.add_argument('--query-log', default='', help="a file to record every search to, for replay.py")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    service = QueryService(arguments.database, arguments.workers, arguments.max_pending, arguments.costar,
+                           gp.QueryLog(arguments.query_log) if arguments.query_log != '' else None)
+    print(f"Serving {arguments.database} on http://{arguments.host}:{arguments.port}")
+    try:
+        asyncio.run(service.serve(arguments.host, arguments.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,213 @@
+"""
+Module Description
+==================
+A file that runs the searches recorded in a query log, made by graph_processing.QueryLog, again on any graph database
+and backend, with a chosen number of searches running at once. It reports the median, 95th, and 99th percentile
+latencies of the searches, overall and by endpoint, and how many searches were run per second. Since the searches are
+the ones people actually made, this measures a change to the program on the real mix of queries, not just synthetic
+ones.
+
+Each search is also checked against the one recorded, and searches that found paths of different lengths are counted
+as mismatches, so a change that makes searches faster but wrong shows up.
+
+Before the searches are timed, the most often recorded ones can be run once to warm the caches of the graph and the
+database, as warm_up does. A service can warm up the same way when it starts.
+
+Copyright and Usage Information
+===============================
+This file is solely provided for the use in grading and review of the named student's
+work by the TAs and Professors of CSC111. All further distribution of this code whether
+as is or modified is firmly prohibited.
+
+This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
+"""
+from __future__ import annotations
+import argparse
+import json
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import graph_processing as gp
+
+# The default number of the most often recorded searches run to warm up a graph
+WARM_COUNT = 20
+
+
+def read_log(file_name: str) -> list[dict]:
+    """
+    Return the entries of the query log at file_name, in the order they were recorded. Lines that aren't complete
+    entries, such as the last line of a log whose program was stopped while writing it, are skipped.
+    """
+    entries = []
+    with open(file_name, encoding='UTF-8') as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict) and 'endpoint' in entry:
+                entries.append(entry)
+    return entries
+
+
+def run_entry(graph: gp.ShortestActorGraph, entry: dict) -> dict[str, gp.SearchResult]:
+    """
+    Run the search recorded in entry on graph, and return a mapping from each of its targets to the result of the
+    search for it. Raises a ValueError if entry's endpoint isn't one a query log records.
+    """
+    actor1, targets = entry['actor1'], entry['targets']
+    if entry['endpoint'] == 'path':
+        return {target: graph.find_path(actor1, target) for target in targets}
+    elif entry['endpoint'] == 'restricted_path':
+        return {target: graph.find_restricted_path(actor1, target, *entry['restrictions']) for target in targets}
+    elif entry['endpoint'] == 'paths':
+        return graph.find_paths(actor1, targets)
+    else:
+        raise ValueError(f"{entry['endpoint']} is not an endpoint of a query log")
+
+
+def hottest_queries(entries: list[dict], count: int) -> list[dict]:
+    """
+    Return the count searches recorded most often in entries, from the most to the least often recorded
+
+    >>> entries = [{'endpoint': 'path', 'actor1': 'nm1', 'targets': ['nm2'], 'restrictions': None},
+    ...            {'endpoint': 'path', 'actor1': 'nm3', 'targets': ['nm4'], 'restrictions': None},
+    ...            {'endpoint': 'path', 'actor1': 'nm3', 'targets': ['nm4'], 'restrictions': None}]
+    >>> [entry['actor1'] for entry in hottest_queries(entries, 2)]
+    ['nm3', 'nm1']
+    """
+    counts = Counter()
+    first_entries = {}
+    for entry in entries:
+        key = json.dumps([entry['endpoint'], entry['actor1'], entry['targets'], entry.get('restrictions')])
+        counts[key] += 1
+        first_entries.setdefault(key, entry)
+    return [first_entries[key] for key, _ in counts.most_common(count)]
+
+
+def warm_up(graph: gp.ShortestActorGraph, entries: list[dict], count: int = WARM_COUNT) -> int:
+    """
+    Run the count searches recorded most often in entries on graph, so the pages and caches they use are loaded before
+    they are needed. Returns the number of searches run.
+    """
+    hottest = hottest_queries(entries, count)
+    for entry in hottest:
+        run_entry(graph, entry)
+    return len(hottest)
+
+
+def replay(graph: gp.ShortestActorGraph, entries: list[dict], concurrency: int = 1) -> dict:
+    """
+    Run every search recorded in entries on graph, with concurrency searches running at once, and return a report of
+    their latencies and throughput, ready to be turned into JSON.
+
+    Preconditions:
+        - concurrency > 0
+    """
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        outcomes = list(executor.map(lambda entry: _time_entry(graph, entry), entries))
+    seconds = time.perf_counter() - start_time
+
+    latencies = {}
+    for endpoint, latency, _, _ in outcomes:
+        latencies.setdefault(endpoint, []).append(latency)
+
+    return {
+        'queries': len(entries),
+        'concurrency': concurrency,
+        'backend': type(graph).__name__,
+        'seconds': seconds,
+        'throughput': len(entries) / seconds if seconds > 0 else 0.0,
+        'errors': sum(1 for outcome in outcomes if outcome[3] != ''),
+        'mismatches': sum(1 for outcome in outcomes if outcome[2]),
+        'latency': summarize_latencies([outcome[1] for outcome in outcomes]),
+        'endpoints': {endpoint: summarize_latencies(times) for endpoint, times in latencies.items()}
+    }
+
+
+def _time_entry(graph: gp.ShortestActorGraph, entry: dict) -> tuple[str, float, bool, str]:
+    """
+    Run the search recorded in entry on graph, and return its endpoint, the seconds it took, whether it found paths of
+    different lengths than were recorded, and the error it raised, or an empty string if it didn't raise one
+    """
+    start_time = time.perf_counter()
+    try:
+        results = run_entry(graph, entry)
+    except (ValueError, KeyError, TypeError) as error:
+        return entry.get('endpoint', ''), time.perf_counter() - start_time, False, str(error)
+    latency = time.perf_counter() - start_time
+
+    mismatched = False
+    for target, status, path_length in zip(entry['targets'], entry['statuses'], entry['path_lengths']):
+        result = results[target]
+        if gp.CUT_OFF not in (status, result.status) and len(result.path) != path_length:
+            mismatched = True
+
+    return entry['endpoint'], latency, mismatched, ''
+
+
+def summarize_latencies(latencies: list[float]) -> dict[str, float]:
+    """
+    Return the number of latencies, and their mean, median, 95th and 99th percentiles, and maximum, in seconds
+
+    >>> summary = summarize_latencies([float(latency) for latency in range(1, 101)])
+    >>> [summary['p50'], summary['p95'], summary['p99'], summary['max']]
+    [51.0, 96.0, 100.0, 100.0]
+    >>> summarize_latencies([])['count']
+    0
+    """
+    if len(latencies) == 0:
+        return {'count': 0}
+
+    sorted_latencies = sorted(latencies)
+
+    def percentile(fraction: float) -> float:
+        return sorted_latencies[min(len(latencies) - 1, int(len(latencies) * fraction))]
+
+    return {
+        'count': len(latencies),
+        'mean': sum(latencies) / len(latencies),
+        'p50': percentile(0.5),
+        'p95': percentile(0.95),
+        'p99': percentile(0.99),
+        'max': sorted_latencies[-1]
+    }
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    parser = argparse.ArgumentParser(description="Run the searches of a query log again and time them")
+    parser.add_argument('log', help="the query log to replay")
+    parser.add_argument('--database', default='data_files/actors_and_movies.db',
+                        help="the graph database to search, or the manifest of its shards")
+    parser.add_argument('--backend', choices=gp.BACKENDS, default='sqlite', help="how to search the database")
+    parser.add_argument('--concurrency', type=int, default=1, help="the number of searches to run at once")
+    parser.add_argument('--search-threads', type=int, default=1,
+                        help="the number of threads looking up the nodes of each level of a search")
+    parser.add_argument('--warm', type=int, default=0,
+                        help="the number of the most often recorded searches to run before timing the rest")
+    parser.add_argument('--output', default='', help="where to save the report as JSON")
+    arguments = parser.parse_args()
+
+    log_entries = read_log(arguments.log)
+    replayed_graph = gp.open_graph(arguments.database, arguments.backend, read_only=True,
+                                   search_threads=arguments.search_threads)
+    if arguments.warm > 0:
+        print(f"Warmed up with {warm_up(replayed_graph, log_entries, arguments.warm)} searches")
+
+    report = replay(replayed_graph, log_entries, arguments.concurrency)
+    replayed_graph.close()
+    if arguments.output != '':
+        with open(arguments.output, 'w', encoding='UTF-8') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    print(f"Replayed {report['queries']} searches in {report['seconds']:.2f} seconds "
+          f"({report['throughput']:.2f} per second), with {report['errors']} errors and "
+          f"{report['mismatches']} mismatches")
+    for endpoint_name, summary in [('all', report['latency']), *report['endpoints'].items()]:
+        if summary['count'] > 0:
+            print(f"{endpoint_name}: {summary['count']} searches, p50 {summary['p50'] * 1000:.2f} ms, "
+                  f"p95 {summary['p95'] * 1000:.2f} ms, p99 {summary['p99'] * 1000:.2f} ms")
@@ -0,0 +1,333 @@
+"""
+Module Description
+==================
+A file with a version of ShortestActorGraph that keeps the whole graph in memory as a scipy.sparse matrix. Every actor
+and movie id is given an integer index, and a search expands an entire level of the breadth first search at once with
+NumPy array operations, instead of looking up the adjacent nodes of one node at a time in the database.
+
+The database is still used for names and ids, so everything other than searching works as it does in graph_processing.
+
+Copyright and Usage Information
+===============================
+This file is solely provided for the use in grading and review of the named student's
+work by the TAs and Professors of CSC111. All further distribution of this code whether
+as is or modified is firmly prohibited.
+
+This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
+"""
+import sqlite3 as sql
+from array import array
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+import graph_processing as gp
+import sql_processing
+
+# The values of _death_states for each node
+NOT_AN_ACTOR = -1
+ALIVE = 0
+DECEASED = 1
+
+# The value of _release_years for nodes without a known release year
+UNKNOWN_YEAR = -1
+
+
+class SparseActorGraph(gp.ShortestActorGraph):
+    """
+    A ShortestActorGraph that searches an in memory copy of the edge table, stored as a compressed sparse row matrix.
+
+    Paths are returned as lists of IMDb ids, the same as ShortestActorGraph. Restricted searches don't use materialized
+    views, as restrictions are checked with a mask over all nodes instead.
+    """
+
+    # Private Instance Attributes:
+    #   - _ids: The id of each node, with the node's index as its position in the list
+    #   - _indices: A mapping from the id of each node to its index
+    #   - _adjacency: The adjacency matrix of the graph, where row i lists the indices of the nodes adjacent to node i
+    #   - _death_states: For each node index, ALIVE or DECEASED for actors in the actor table, or else NOT_AN_ACTOR
+    #   - _release_years: For each node index, the release year of movies in the movie table, and UNKNOWN_YEAR otherwise
+    #   - _components: The connected component label of each node index, or None if they haven't been computed yet
+    #   - _masks: A mapping from the name of a set of restrictions to the mask of the nodes matching them
+
+    _ids: list[str]
+    _indices: dict[str, int]
+    _adjacency: sparse.csr_array
+    _death_states: np.ndarray
+    _release_years: np.ndarray
+    _components: np.ndarray | None
+    _masks: dict[str, np.ndarray]
+
+    def __init__(self, database_path: str, query_log: gp.QueryLog | None = None) -> None:
+        """
+        Initializes the graph, loading the edge table, and the attributes restrictions are checked against, from the
+        database into memory. If query_log is given, every search run on this graph is recorded to it.
+
+        Preconditions:
+            - database_path refers to a valid sqlite3 database that has at least the tables "actor", "movie", and
+              "edge", or to the manifest of such a database split into shards
+        """
+        super().__init__(database_path, query_log=query_log)
+        self._ids = []
+        self._indices = {}
+        self._components = None
+        self._masks = {}
+
+        rows = array('i')
+        columns = array('i')
+
+        for database in self._databases():
+            with self._connect(database) as connection:
+                self._load_edges(connection, rows, columns)
+
+        self._death_states = np.full(len(self._ids), NOT_AN_ACTOR, dtype=np.int8)
+        self._release_years = np.full(len(self._ids), UNKNOWN_YEAR, dtype=np.int32)
+        for database in self._databases():
+            with self._connect(database) as connection:
+                cursor = connection.cursor()
+
+                for actor_id, death_year in cursor.execute("""SELECT id, deathYear FROM actor"""):
+                    if actor_id in self._indices:
+                        self._death_states[self._indices[actor_id]] = (
+                            ALIVE if sql_processing.year_value(death_year) is None else DECEASED)
+
+                for movie_id, start_year in cursor.execute("""SELECT id, startYear FROM movie"""):
+                    release_year = sql_processing.year_value(start_year)
+                    if movie_id in self._indices and release_year is not None:
+                        self._release_years[self._indices[movie_id]] = release_year
+
+                cursor.close()
+
+        node_count = len(self._ids)
+        rows = np.frombuffer(rows, dtype=np.int32)
+        columns = np.frombuffer(columns, dtype=np.int32)
+        self._adjacency = sparse.csr_array((np.ones(len(rows), dtype=np.int8), (rows, columns)),
+                                           shape=(node_count, node_count))
+        self._adjacency.sum_duplicates()
+
+    def _load_edges(self, connection: sql.Connection, rows: array, columns: array) -> None:
+        """
+        Append the row and column indices of each edge in the edge table of the database connection is open to, to
+        rows and columns
+        """
+        for object_id, connections in connection.execute("""SELECT object_id, connections FROM edge"""):
+            row = self._intern(object_id)
+            for adjacent in connections.split(','):
+                if adjacent != '':
+                    rows.append(row)
+                    columns.append(self._intern(adjacent))
+
+    def _intern(self, object_id: str) -> int:
+        """
+        Return the index of object_id, giving it the next index if it doesn't have one yet
+        """
+        if object_id not in self._indices:
+            self._indices[object_id] = len(self._ids)
+            self._ids.append(object_id)
+        return self._indices[object_id]
+
+    def get_adjacent_nodes(self, given_id: str) -> set[str]:
+        """
+        Given an actor or movie id, return the adjacent nodes to that id using the in memory adjacency matrix
+
+        Preconditions:
+            - id is a valid actor or movie id
+        """
+        if given_id not in self._indices:
+            return set()
+
+        index = self._indices[given_id]
+        start, end = self._adjacency.indptr[index], self._adjacency.indptr[index + 1]
+        return {self._ids[adjacent] for adjacent in self._adjacency.indices[start:end]}
+
+    def find_path(self, actor1: str, actor2: str, limits: gp.SearchLimits | None = None) -> gp.SearchResult:
+        """
+        Given two actor IDs, search for the shortest path between the two actors, stopping early if the search goes
+        past any of the given limits.
+
+        Actors in different connected components are reported as having no path without searching at all.
+
+        Preconditions:
+            - The actors are in the graph
+        """
+        return self._run_search(actor1, actor2, lambda stats: self._find_connected_paths(
+            actor1, [actor2], stats, limits)[actor2])
+
+    def find_paths(self, actor1: str, targets: list[str],
+                   limits: gp.SearchLimits | None = None) -> dict[str, gp.SearchResult]:
+        """
+        Given an actor ID and a list of target actor IDs, search for the shortest path from actor1 to every target at
+        once, stopping once all of them are found or the search goes past any of the given limits. Return a mapping
+        from each target to the result of its search.
+
+        Targets in a different connected component than actor1, or that aren't in the graph, are reported as having no
+        path without searching for them.
+
+        Preconditions:
+            - actor1 is in the graph
+
+        >>> s = SparseActorGraph('data_files/actors_and_movies.db')
+        >>> results = s.find_paths('nm0000206', ['nm0000138', 'nm9999999'])
+        >>> [results['nm0000138'].status, results['nm9999999'].status]
+        ['found', 'not found']
+        >>> results['nm0000138'].path == s.get_path('nm0000206', 'nm0000138')
+        True
+        """
+        return self._run_searches(actor1, targets, lambda stats: self._find_connected_paths(
+            actor1, targets, stats, limits))
+
+    def _find_connected_paths(self, actor1: str, targets: list[str], stats: gp.SearchStats,
+                              limits: gp.SearchLimits | None) -> dict[str, gp.SearchResult]:
+        """
+        Search for the shortest path from actor1 to each of targets that is in the same connected component
+        """
+        connected = targets
+        if actor1 in self._indices and any(target != actor1 and target in self._indices for target in targets):
+            if self._components is None:
+                _, self._components = csgraph.connected_components(self._adjacency, directed=False)
+            else:
+                self._thread_counts()['cache_hits'] += 1
+
+            component = self._components[self._indices[actor1]]
+            connected = [target for target in targets
+                         if target not in self._indices or self._components[self._indices[target]] == component]
+
+        results = self._frontier_search(actor1, connected, None, stats, limits)
+        return {target: results.get(target, gp.SearchResult(gp.NOT_FOUND, [], stats)) for target in targets}
+
+    def find_restricted_path(self, actor1: str, actor2: str, check_is_alive: str = "Any",
+                             released_before: int = 9999, released_after: int = 0,
+                             limits: gp.SearchLimits | None = None) -> gp.SearchResult:
+        """
+        Given two actor IDs, search for the shortest path between the two with the same restrictions as
+        get_restricted_path, stopping early if the search goes past any of the given limits.
+
+        Preconditions:
+            - is_alive.lower() in ["alive", "deceased", ""]
+        """
+        restrictions = (check_is_alive, released_before, released_after)
+        return self._run_search(actor1, actor2, lambda stats: self._frontier_search(
+            actor1, [actor2], self._restriction_mask(*restrictions), stats, limits)[actor2], restrictions)
+
+    def _restriction_mask(self, want_alive: str, released_before: int, released_after: int) -> np.ndarray:
+        """
+        Return a boolean array that is True at the index of every node that matches the given restrictions, using the
+        same rules as match_requirements. The mask is only made the first time the restrictions are used.
+        """
+        mask_name = gp.RestrictedViewCache.view_name(want_alive, released_before, released_after)
+        if mask_name in self._masks:
+            self._thread_counts()['cache_hits'] += 1
+            return self._masks[mask_name]
+
+        is_actor = self._death_states != NOT_AN_ACTOR
+        if want_alive.lower() == 'any':
+            actor_matches = np.ones(len(self._ids), dtype=bool)
+        else:
+            actor_matches = (self._death_states == ALIVE) == (want_alive.lower() == 'alive')
+
+        known_year = self._release_years != UNKNOWN_YEAR
+        movie_matches = (released_after < self._release_years) & (self._release_years < released_before)
+
+        self._masks[mask_name] = np.where(is_actor, actor_matches, ~known_year | movie_matches)
+        return self._masks[mask_name]
+
+    def _frontier_search(self, actor1: str, targets: list[str], valid: np.ndarray | None, stats: gp.SearchStats,
+                         limits: gp.SearchLimits | None) -> dict[str, gp.SearchResult]:
+        """
+        Search for the shortest path from actor1 to each of targets, expanding each whole level of the search at once,
+        and stopping as soon as every target is found.
+
+        If valid is given, only the nodes it is True for are expanded. Targets are always accepted as the end of a path.
+        The limits are checked and told of the search's progress before each level, and the node expansion budget is
+        never gone over. The progress of the search is recorded in stats, which every result shares.
+        """
+        results = {}
+        remaining = {}
+        for target in targets:
+            if target == actor1:
+                results[target] = gp.SearchResult(gp.FOUND, [actor1], stats)
+            elif actor1 in self._indices and target in self._indices:
+                remaining[self._indices[target]] = target
+        if len(remaining) == 0:
+            return {target: results.get(target, gp.SearchResult(gp.NOT_FOUND, [], stats)) for target in targets}
+
+        source = self._indices[actor1]
+        indptr, indices = self._adjacency.indptr, self._adjacency.indices
+
+        parents = np.full(len(self._ids), -1, dtype=np.int64)
+        parents[source] = source
+        stats.visited = 1
+        frontier = np.array([source], dtype=np.int64)
+        remaining_indices = np.array(list(remaining), dtype=np.int64)
+
+        while frontier.size > 0:
+            cut_off_reason = '' if limits is None else limits.cut_off_reason(stats.nodes_expanded)
+            if cut_off_reason != '':
+                return {target: results.get(target, gp.SearchResult(gp.CUT_OFF, [], stats, cut_off_reason))
+                        for target in targets}
+
+            budget = frontier.size
+            if limits is not None and limits.max_expansions is not None:
+                budget = limits.max_expansions - stats.nodes_expanded
+            truncated = frontier.size > budget
+            frontier = frontier[:budget]
+
+            stats.depth += 1
+            stats.peak_frontier = max(stats.peak_frontier, frontier.size)
+            if limits is not None:
+                limits.report_progress(stats.depth, stats.visited)
+            stats.nodes_expanded += frontier.size
+
+            # Gather every row of the frontier into one array, alongside the node each entry came from
+            starts = indptr[frontier]
+            counts = indptr[frontier + 1] - starts
+            total = int(counts.sum())
+            row_offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+            adjacent = indices[row_offsets + np.arange(total)]
+            sources = np.repeat(frontier, counts)
+            stats.neighbours_scanned += total
+
+            unvisited = parents[adjacent] == -1
+            adjacent, first_seen = np.unique(adjacent[unvisited], return_index=True)
+            parents[adjacent] = sources[unvisited][first_seen]
+
+            found = adjacent[np.isin(adjacent, remaining_indices)]
+            for index in found:
+                results[remaining.pop(int(index))] = gp.SearchResult(gp.FOUND, self._trace_indices(parents, index),
+                                                                     stats)
+            stats.visited += adjacent.size
+            if len(remaining) == 0:
+                return {target: results.get(target, gp.SearchResult(gp.NOT_FOUND, [], stats)) for target in targets}
+            remaining_indices = np.array(list(remaining), dtype=np.int64)
+
+            frontier = adjacent if valid is None else adjacent[valid[adjacent]]
+
+            if truncated:
+                return {target: results.get(target, gp.SearchResult(gp.CUT_OFF, [], stats, 'budget'))
+                        for target in targets}
+
+        return {target: results.get(target, gp.SearchResult(gp.NOT_FOUND, [], stats)) for target in targets}
+
+    def _trace_indices(self, parents: np.ndarray, index: int) -> list[str]:
+        """
+        Return the ids of the path from the start of a search to the node at index. The start of the search is the node
+        that is its own parent.
+        """
+        path = [index]
+        while parents[path[-1]] != path[-1]:
+            path.append(int(parents[path[-1]]))
+        path.reverse()
+        return [self._ids[node] for node in path]
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 120,
+        'disable': ['E1136'],
+        'extra-imports': ['sqlite3', 'array', 'numpy', 'scipy', 'scipy.sparse', 'graph_processing', 'sql_processing'],
+        'allowed-io': [],
+        'max-nested-blocks': 4
+    })
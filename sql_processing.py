@@ -11,8 +11,17 @@ That graph has three tables, actor, movie, and edge.
     - edge has information about which actor has played in what movie, stored as an adjacency list, based on the IDs
     of the movies and actors. The adjacency list itself is comma separated values (IDs)
 
+It can also have a costar table, an adjacency list between actors alone, where each adjacent actor is paired with a
+movie both actors played in.
+
 This is created because the raw graph takes upwards of 15 GB of RAM to use, and that is simply too much.
 
+The graph database is usually made from a main database holding all the downloaded data, but build_graph_database can
+also make it straight from the downloaded files, in a fixed amount of memory.
+
+A graph database can also be split into several shards, smaller databases that each hold some of the rows of every
+table, listed in a manifest. See shard_database.
+
 Copyright and Usage Information
 ===============================
 This file is solely provided for the use in grading and review of the named student's
@@ -23,7 +32,18 @@ This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
 """
 import sqlite3 as sql
 import csv
+import heapq
+import json
 import os
+import re
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import groupby, islice
+from typing import Iterator
+import profiling
 
 MAIN_DATABASE = 'data_files/all_data.db'
 
@@ -33,6 +53,32 @@ MOVIE_TO_ACTOR = 'data_files/title.principals.tsv'
 
 DATABASE_NAME = 'data_files/actors_and_movies.db'
 
+# The name of the manifest listing the shards of a sharded graph database, and the ways a database can be sharded
+SHARD_MANIFEST = 'shards.json'
+SHARD_SCHEMES = ('hash', 'range')
+
+# The number of rows to insert at once when writing a restricted edge table, the costar table, or a shard
+VIEW_BATCH_SIZE = 10000
+
+# The number of movie casts kept in memory while creating the costar table
+CAST_CACHE_SIZE = 4096
+
+# The number of rows build_graph_database sorts in memory at once, before spilling them to a temporary file
+SORT_RUN_SIZE = 500000
+
+# The column types of the actor and movie tables once migrated by migrate_typed_schema, and the indexes it adds
+TYPED_COLUMNS = {
+    'actor': (('id', 'TEXT'), ('name', 'TEXT'), ('birthYear', 'INTEGER'), ('deathYear', 'INTEGER'),
+              ('actorOrActress', 'TEXT')),
+    'movie': (('id', 'TEXT'), ('title', 'TEXT'), ('isAdult', 'INTEGER'), ('startYear', 'INTEGER'),
+              ('endYear', 'INTEGER'), ('runtimeMinutes', 'INTEGER'), ('genre', 'TEXT'))
+}
+TYPED_INDEXES = (
+    """CREATE INDEX idx_actor_alive ON actor(name) WHERE deathYear IS NULL""",
+    """CREATE INDEX idx_actor_death_year ON actor(deathYear)""",
+    """CREATE INDEX idx_movie_start_year ON movie(startYear)"""
+)
+
 
 class FileFormatError(Exception):
     """
@@ -46,12 +92,16 @@ class FileFormatError(Exception):
         return "The file attempted to be read is not in the correct format"
 
 
-def compile_full_data(main_database: str) -> str:
+@profiling.profiled
+def compile_full_data(main_database: str, actor_file: str = ID_TO_ACTOR, movie_file: str = ID_TO_MOVIE,
+                      connection_file: str = MOVIE_TO_ACTOR) -> str:
     """
     Will create a database of ALL the data in necessary files
 
     However this is FAR too big, so we will be working with a smaller database
 
+    The files are the IMDb name.basics, title.basics, and title.principals files, in that order.
+
     Returns the name of the database if it successfully created it
 
     If the database already exists, returns an empty string
@@ -62,10 +112,10 @@ def compile_full_data(main_database: str) -> str:
     if os.path.exists(main_database):
         return ''
 
-    with sql.connect(main_database) as connection:
+    with profiling.trace(sql.connect(main_database)) as connection:
         cursor = connection.cursor()
 
-        with open(ID_TO_ACTOR, encoding='UTF-8') as file:
+        with open(actor_file, encoding='UTF-8') as file:
             reader = csv.reader(file, delimiter='\t')
 
             header = next(reader)
@@ -85,7 +135,7 @@ def compile_full_data(main_database: str) -> str:
             cursor.execute("""CREATE UNIQUE INDEX idx_actor_id ON actor(nconst)""")
             connection.commit()
 
-        with open(ID_TO_MOVIE, encoding='UTF-8') as file:
+        with open(movie_file, encoding='UTF-8') as file:
             reader = csv.reader(file, delimiter='\t')
 
             header = next(reader)
@@ -106,7 +156,7 @@ def compile_full_data(main_database: str) -> str:
             cursor.execute("""CREATE UNIQUE INDEX idx_movie_id ON movie(tconst)""")
             connection.commit()
 
-        with open(MOVIE_TO_ACTOR, encoding='UTF-8') as file:
+        with open(connection_file, encoding='UTF-8') as file:
             reader = csv.reader(file, delimiter='\t')
 
             header = next(reader)
@@ -142,11 +192,12 @@ def create_database(database_name: str) -> str:
     if os.path.exists(database_name):
         return ''
     else:
-        connection = sql.connect(database_name)
+        connection = profiling.trace(sql.connect(database_name))
         connection.close()
         return database_name
 
 
+@profiling.profiled
 def create_movie_table(creation_database_name: str, main_database: str, number_of_movies: int) -> str:
     """
     Loads a number of random movies from the database. These movies will not be guaranteed to be connected. But that's
@@ -165,10 +216,10 @@ def create_movie_table(creation_database_name: str, main_database: str, number_o
     if not os.path.exists(main_database) or not os.path.exists(creation_database_name):
         return ''
 
-    insertion_connection = sql.connect(creation_database_name)
+    insertion_connection = profiling.trace(sql.connect(creation_database_name))
     insertion_cursor = insertion_connection.cursor()
 
-    main_connection = sql.connect(main_database)
+    main_connection = profiling.trace(sql.connect(main_database))
     main_cursor = main_connection.cursor()
 
     insertion_cursor.execute("""CREATE TABLE movie(
@@ -196,6 +247,7 @@ def create_movie_table(creation_database_name: str, main_database: str, number_o
     return main_database
 
 
+@profiling.profiled
 def create_actor_table(creation_database_name: str, main_database: str) -> None:
     """
     Creates the actor table and edge table from the main_database in creation_database_name. Only adds actors that act
@@ -205,10 +257,10 @@ def create_actor_table(creation_database_name: str, main_database: str) -> None:
         - creation_database_name is a valid database that has its movies
         - main_database is a valid main database
     """
-    insertion_connection = sql.connect(creation_database_name)
+    insertion_connection = profiling.trace(sql.connect(creation_database_name))
     insertion_cursor = insertion_connection.cursor()
 
-    main_connection = sql.connect(main_database)
+    main_connection = profiling.trace(sql.connect(main_database))
     main_cursor = main_connection.cursor()
 
     insertion_cursor.execute("""CREATE TABLE actor(id PRIMARY KEY, name, birthYear, deathYear, actorOrActress)""")
@@ -284,6 +336,642 @@ def create_actor_table(creation_database_name: str, main_database: str) -> None:
     main_connection.close()
 
 
+@profiling.profiled
+def build_graph_database(database_name: str, actor_file: str = ID_TO_ACTOR, movie_file: str = ID_TO_MOVIE,
+                         connection_file: str = MOVIE_TO_ACTOR, number_of_movies: int = -1,
+                         run_size: int = SORT_RUN_SIZE) -> str:
+    """
+    Creates the graph database at database_name straight from the IMDb files, without making a main database first.
+    It has the same tables as one made by create_movie_table then create_actor_table: the first number_of_movies movies
+    in movie_file (or all of them if number_of_movies is negative), the actors and actresses who played in them, and the
+    edges between the two.
+
+    Each file is read once, front to back. The actor and actress rows of connection_file are sorted by movie, then by
+    actor, with an external merge sort, which sorts run_size rows at a time, spills each sorted run to a temporary file
+    next to database_name, and merges the runs back together. Both sorts are joined in order to the movies and actors
+    they belong to, so only about run_size rows are in memory at once, however large the files are.
+
+    Returns the name of the database if it was created, but an empty string if it already exists or one of the files
+    could not be found.
+
+    Preconditions:
+        - run_size > 0
+    """
+    if database_name == '':
+        database_name = DATABASE_NAME
+
+    if os.path.exists(database_name) or not all(os.path.exists(file)
+                                                for file in (actor_file, movie_file, connection_file)):
+        return ''
+
+    connection = profiling.trace(sql.connect(database_name))
+    connection.execute("""CREATE TABLE movie(
+                    id PRIMARY KEY, title, isAdult, startYear, endYear,
+                    runtimeMinutes, genre)""")
+    connection.execute("""CREATE TABLE actor(id PRIMARY KEY, name, birthYear, deathYear, actorOrActress)""")
+    connection.execute("""CREATE TABLE edge(
+                object_id PRIMARY KEY,
+                connections)""")
+
+    with open(movie_file, encoding='UTF-8') as file:
+        reader = csv.reader(file, delimiter='\t')
+        next(reader)
+        movies = ((line[0], line[2], line[4], line[5], line[6], line[7], line[8]) for line in reader
+                  if len(line) == 9 and line[1] == 'movie')
+        _insert_all(connection, 'movie', movies if number_of_movies < 0 else islice(movies, number_of_movies))
+    connection.execute("""CREATE UNIQUE INDEX idx_movie_id ON movie(id)""")
+    connection.commit()
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(database_name))) as directory:
+        casts = _ExternalSorter(directory, run_size)
+        with open(connection_file, encoding='UTF-8') as file:
+            reader = csv.reader(file, delimiter='\t')
+            next(reader)
+            for line in reader:
+                if len(line) == 6 and (line[3] == 'actor' or line[3] == 'actress'):
+                    casts.add((line[0], line[2]))
+
+        filmographies = _ExternalSorter(directory, run_size)
+        movie_ids = ((movie[0], None) for movie in connection.execute("""SELECT id FROM movie ORDER BY id"""))
+        movie_edges = []
+        for movie_id, _, cast in _join_sorted(movie_ids, _group_sorted(casts.sorted_rows())):
+            cast = [] if cast is None else cast
+            movie_edges.append((movie_id, ','.join(cast)))
+            for actor_id in cast:
+                filmographies.add((actor_id, movie_id))
+
+            if len(movie_edges) >= VIEW_BATCH_SIZE:
+                _insert_rows(connection, 'edge', movie_edges)
+                movie_edges = []
+        _insert_rows(connection, 'edge', movie_edges)
+
+        names = _ExternalSorter(directory, run_size)
+        with open(actor_file, encoding='UTF-8') as file:
+            reader = csv.reader(file, delimiter='\t')
+            next(reader)
+            for line in reader:
+                if len(line) == 6:
+                    names.add(tuple(line[0:5]))
+
+        actors = []
+        actor_edges = []
+        for actor_id, movie_ids, actor in _join_sorted(_group_sorted(filmographies.sorted_rows()),
+                                                       ((row[0], row) for row in names.sorted_rows())):
+            if actor is None:
+                continue
+            if 'actor' in actor[4]:
+                actors.append(actor[0:4] + ('M',))
+            elif 'actress' in actor[4]:
+                actors.append(actor[0:4] + ('F',))
+            else:
+                actors.append(actor[0:4] + ('NULL',))
+            actor_edges.append((actor_id, ','.join(movie_ids)))
+
+            if len(actors) >= VIEW_BATCH_SIZE:
+                _insert_rows(connection, 'actor', actors)
+                _insert_rows(connection, 'edge', actor_edges)
+                actors, actor_edges = [], []
+        _insert_rows(connection, 'actor', actors)
+        _insert_rows(connection, 'edge', actor_edges)
+
+    connection.execute("""CREATE UNIQUE INDEX idx_actor_id ON actor(id)""")
+    connection.execute("""CREATE UNIQUE INDEX idx_edge ON edge(object_id)""")
+    connection.commit()
+    connection.close()
+    return database_name
+
+
+class _ExternalSorter:
+    """
+    Sorts more rows of strings than fit in memory. Every run_size rows added are sorted and spilled to a temporary file
+    as a run, then the runs are merged back together in order.
+    """
+    # Private Instance Attributes:
+    #   - _directory: The directory the runs are spilled to
+    #   - _run_size: The number of rows kept in memory before they are spilled
+    #   - _rows: The rows added since the last run was spilled
+    #   - _runs: The file paths of the spilled runs
+
+    _directory: str
+    _run_size: int
+    _rows: list[tuple[str, ...]]
+    _runs: list[str]
+
+    def __init__(self, directory: str, run_size: int) -> None:
+        """
+        Initializes a sorter with no rows, that spills its runs to directory
+
+        Preconditions:
+            - run_size > 0
+        """
+        self._directory = directory
+        self._run_size = run_size
+        self._rows = []
+        self._runs = []
+
+    def add(self, row: tuple[str, ...]) -> None:
+        """
+        Add row to the rows to sort
+        """
+        self._rows.append(row)
+        if len(self._rows) >= self._run_size:
+            self._spill()
+
+    def _spill(self) -> None:
+        """
+        Sort the rows in memory and write them to a new run
+        """
+        self._rows.sort()
+        with tempfile.NamedTemporaryFile('w', encoding='UTF-8', newline='', dir=self._directory, suffix='.tsv',
+                                         delete=False) as file:
+            csv.writer(file, delimiter='\t').writerows(self._rows)
+        self._runs.append(file.name)
+        self._rows = []
+
+    def sorted_rows(self) -> Iterator[tuple[str, ...]]:
+        """
+        Return an iterator over every row added, in sorted order, with duplicate rows left out. Each run is deleted
+        once it has been read. Rows can't be added once this is called.
+
+        >>> sorter = _ExternalSorter(tempfile.gettempdir(), 2)
+        >>> for row in [('b', '1'), ('a', '2'), ('b', '1'), ('a', '1'), ('c', '0')]:
+        ...     sorter.add(row)
+        >>> list(sorter.sorted_rows())
+        [('a', '1'), ('a', '2'), ('b', '1'), ('c', '0')]
+        """
+        if len(self._runs) == 0:
+            self._rows.sort()
+            rows = iter(self._rows)
+        else:
+            if len(self._rows) > 0:
+                self._spill()
+            rows = heapq.merge(*(self._read_run(run) for run in self._runs))
+        self._rows = []
+
+        previous = None
+        for row in rows:
+            if row != previous:
+                yield row
+            previous = row
+
+    @staticmethod
+    def _read_run(run: str) -> Iterator[tuple[str, ...]]:
+        """
+        Return an iterator over the rows of the run at the file path run, deleting it once they have all been read
+        """
+        with open(run, encoding='UTF-8', newline='') as file:
+            for row in csv.reader(file, delimiter='\t'):
+                yield tuple(row)
+        os.remove(run)
+
+
+def _group_sorted(rows: Iterator[tuple[str, str]]) -> Iterator[tuple[str, list[str]]]:
+    """
+    Return an iterator over the rows sorted by their first values grouped together, as each first value paired with
+    the second values of its rows
+
+    >>> list(_group_sorted(iter([('a', '1'), ('a', '2'), ('b', '3')])))
+    [('a', ['1', '2']), ('b', ['3'])]
+    """
+    return ((key, [row[1] for row in group]) for key, group in groupby(rows, key=lambda row: row[0]))
+
+
+def _join_sorted(left: Iterator[tuple[str, object]],
+                 right: Iterator[tuple[str, object]]) -> Iterator[tuple[str, object, object]]:
+    """
+    Return an iterator over each key and value of left, along with the value of the same key in right, or None if right
+    doesn't have the key. Both left and right are sorted by their keys, and have each key at most once.
+
+    >>> list(_join_sorted(iter([('a', 1), ('c', 2)]), iter([('b', 3), ('c', 4)])))
+    [('a', 1, None), ('c', 2, 4)]
+    """
+    right_pair = next(right, None)
+    for key, value in left:
+        while right_pair is not None and right_pair[0] < key:
+            right_pair = next(right, None)
+        yield key, value, right_pair[1] if right_pair is not None and right_pair[0] == key else None
+
+
+def _insert_all(connection: sql.Connection, table_name: str, rows: Iterator[tuple] | list[tuple]) -> None:
+    """
+    Insert rows into the table called table_name of the database connected to by connection, VIEW_BATCH_SIZE at a time
+    """
+    rows = iter(rows)
+    batch = list(islice(rows, VIEW_BATCH_SIZE))
+    while len(batch) > 0:
+        _insert_rows(connection, table_name, batch)
+        batch = list(islice(rows, VIEW_BATCH_SIZE))
+
+
+@profiling.profiled
+def create_restricted_edge_table(view_database: str, graph_database: str, want_alive: str,
+                                 released_before: int, released_after: int) -> str:
+    """
+    Creates a database at view_database with a single edge table, holding the part of graph_database's edge table
+    whose nodes match the given restrictions. Nodes that don't match are removed from every adjacency list, and the
+    rows of movies that don't match are left out entirely, since a search never starts from a movie.
+
+    The restrictions are the same as in ShortestActorGraph.match_requirements. Actors must match want_alive unless it
+    is 'any', and movies with a known release year must be released after released_after and before released_before.
+
+    The database is written under a temporary name unique to this call and moved into place once it is complete, so a
+    partially built view is never seen by a reader, and builds of the same view at once don't write to the same file.
+    The temporary file is removed if the build fails.
+
+    Returns the name of the view database if it was created, but an empty string if there was already a database at
+    view_database or graph_database could not be found.
+
+    Preconditions:
+        - graph_database is a valid database that has at least the tables "actor", "movie", and "edge"
+    """
+    if os.path.exists(view_database) or not os.path.exists(graph_database):
+        return ''
+
+    graph_connection = profiling.trace(sql.connect(graph_database))
+    graph_cursor = graph_connection.cursor()
+
+    excluded = set()
+    if want_alive.lower() == 'alive':
+        excluded.update(actor[0] for actor in graph_cursor.execute("""SELECT id FROM actor
+                WHERE deathYear IS NOT NULL AND deathYear != '\\N'"""))
+    elif want_alive.lower() != 'any':
+        excluded.update(actor[0] for actor in graph_cursor.execute("""SELECT id FROM actor
+                WHERE deathYear IS NULL OR deathYear = '\\N'"""))
+
+    for movie_id, start_year in graph_cursor.execute("""SELECT id, startYear FROM movie"""):
+        release_year = year_value(start_year)
+        if release_year is not None and not released_after < release_year < released_before:
+            excluded.add(movie_id)
+
+    directory = os.path.dirname(view_database) or '.'
+    descriptor, temporary_database = tempfile.mkstemp('.partial', os.path.basename(view_database) + '.', directory)
+    os.close(descriptor)
+
+    try:
+        _write_view(temporary_database, graph_cursor, excluded)
+        os.replace(temporary_database, view_database)
+    finally:
+        graph_cursor.close()
+        graph_connection.close()
+        if os.path.exists(temporary_database):
+            os.remove(temporary_database)
+
+    return view_database
+
+
+def _write_view(view_database: str, graph_cursor: sql.Cursor, excluded: set[str]) -> None:
+    """
+    Write the edge table of a restricted view to the empty database at view_database, from the edge table read with
+    graph_cursor, leaving out the nodes in excluded
+    """
+    view_connection = profiling.trace(sql.connect(view_database))
+    try:
+        view_cursor = view_connection.cursor()
+        view_cursor.execute("""CREATE TABLE edge(object_id PRIMARY KEY, connections) WITHOUT ROWID""")
+
+        inserted_edges = []
+        for object_id, connections in graph_cursor.execute("""SELECT object_id, connections FROM edge"""):
+            if object_id in excluded and object_id[0:2] == 'tt':
+                continue
+
+            kept_nodes = [node for node in connections.split(',') if node != '' and node not in excluded]
+            if len(kept_nodes) > 0:
+                inserted_edges.append((object_id, ','.join(kept_nodes)))
+
+            if len(inserted_edges) >= VIEW_BATCH_SIZE:
+                view_cursor.executemany("""INSERT OR IGNORE INTO edge VALUES(?, ?)""", inserted_edges)
+                inserted_edges = []
+
+        view_cursor.executemany("""INSERT OR IGNORE INTO edge VALUES(?, ?)""", inserted_edges)
+        view_connection.commit()
+        view_cursor.close()
+    finally:
+        view_connection.close()
+
+
+@profiling.profiled
+def create_costar_table(database_name: str) -> None:
+    """
+    Creates the costar table in database_name from its edge table. The costar table is the graph of actors alone,
+    where two actors are adjacent if they have played in a movie together.
+
+    Each row has an actor's id and the actors they played alongside, as comma separated values of the form
+    "actor_id:movie_id", where movie_id is one movie the two actors were both in.
+
+    The rows are made one actor at a time and inserted in batches, so only one actor's co-stars and a bounded number of
+    movie casts are ever kept in memory, no matter how large the casts are.
+
+    Preconditions:
+        - database_name is a valid database that has its edge table, and doesn't have a costar table
+    """
+    connection = profiling.trace(sql.connect(database_name))
+    actor_cursor = connection.cursor()
+    cast_cursor = connection.cursor()
+    insertion_cursor = connection.cursor()
+
+    insertion_cursor.execute("""CREATE TABLE costar(
+                actor_id PRIMARY KEY,
+                connections)""")
+
+    casts = OrderedDict()
+    inserted_costars = []
+    for actor_id, movies in actor_cursor.execute("""SELECT object_id, connections FROM edge
+            WHERE object_id LIKE 'nm%'"""):
+        costars = {}
+        for movie_id in movies.split(','):
+            for costar_id in _get_cast(cast_cursor, casts, movie_id):
+                if costar_id != actor_id and costar_id not in costars:
+                    costars[costar_id] = movie_id
+
+        inserted_costars.append((actor_id, ','.join(f'{costar_id}:{movie_id}'
+                                                    for costar_id, movie_id in costars.items())))
+
+        if len(inserted_costars) >= VIEW_BATCH_SIZE:
+            insertion_cursor.executemany("""INSERT OR IGNORE INTO costar VALUES(?, ?)""", inserted_costars)
+            inserted_costars = []
+
+    insertion_cursor.executemany("""INSERT OR IGNORE INTO costar VALUES(?, ?)""", inserted_costars)
+    connection.commit()
+
+    actor_cursor.close()
+    cast_cursor.close()
+    insertion_cursor.close()
+    connection.close()
+
+
+@profiling.profiled
+def shard_database(database_name: str, directory: str, shard_count: int, scheme: str = 'hash') -> str:
+    """
+    Splits the graph database at database_name into shard_count shards in directory, creating directory if needed.
+    Every row of the actor, movie, edge, and costar tables goes to the shard chosen by shard_index from its id, with
+    the same tables and indexes as database_name. ShortestActorGraph can be given the manifest of the shards in place of
+    a database, and looks each id up in its shard.
+
+    If scheme is 'hash', ids are spread evenly over the shards by a hash of the whole id. If scheme is 'range', each
+    shard holds a range of the numbers of the ids, chosen so the shards hold about as many nodes each.
+
+    The rows are copied in batches, so only a batch of rows for each shard is kept in memory at once.
+
+    Returns the file path of the manifest of the shards, or an empty string if database_name doesn't exist or
+    directory already has a manifest.
+
+    Preconditions:
+        - database_name is a valid graph database that has at least the tables "actor", "movie", and "edge"
+        - shard_count > 0
+        - scheme in SHARD_SCHEMES
+    """
+    manifest_name = os.path.join(directory, SHARD_MANIFEST)
+    if not os.path.exists(database_name) or os.path.exists(manifest_name):
+        return ''
+    os.makedirs(directory, exist_ok=True)
+
+    connection = profiling.trace(sql.connect(database_name))
+    cursor = connection.cursor()
+
+    boundaries = []
+    if scheme == 'range':
+        numbers = array('q', sorted(id_number(object_id) for (object_id,) in cursor.execute("""
+                SELECT object_id FROM edge""")))
+        if len(numbers) > 0:
+            boundaries = [numbers[len(numbers) * shard // shard_count] for shard in range(1, shard_count)]
+
+    shard_files = [f'shard_{shard:03d}.db' for shard in range(shard_count)]
+    shard_connections = []
+    for shard_file in shard_files:
+        if os.path.exists(os.path.join(directory, shard_file)):
+            os.remove(os.path.join(directory, shard_file))
+        shard_connections.append(profiling.trace(sql.connect(os.path.join(directory, shard_file))))
+
+    tables = cursor.execute("""SELECT name, sql FROM sqlite_master
+            WHERE type = 'table' AND name IN ('actor', 'movie', 'edge', 'costar')""").fetchall()
+    for table_name, table_sql in tables:
+        for shard_connection in shard_connections:
+            shard_connection.execute(table_sql)
+
+        batches = [[] for _ in range(shard_count)]
+        for row in cursor.execute(f"""SELECT * FROM "{table_name}" """):
+            shard = shard_index(row[0], shard_count, boundaries)
+            batches[shard].append(row)
+            if len(batches[shard]) >= VIEW_BATCH_SIZE:
+                _insert_rows(shard_connections[shard], table_name, batches[shard])
+                batches[shard] = []
+
+        for shard, batch in enumerate(batches):
+            _insert_rows(shard_connections[shard], table_name, batch)
+
+    indexes = cursor.execute("""SELECT sql FROM sqlite_master
+            WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ('actor', 'movie', 'edge', 'costar')""").fetchall()
+    for shard_connection in shard_connections:
+        for (index_sql,) in indexes:
+            shard_connection.execute(index_sql)
+        shard_connection.commit()
+        shard_connection.close()
+
+    cursor.close()
+    connection.close()
+
+    with open(manifest_name, 'w', encoding='UTF-8') as file:
+        json.dump({'scheme': scheme, 'shards': shard_files, 'boundaries': boundaries,
+                   'tables': [table_name for table_name, _ in tables]}, file, indent=2)
+
+    return manifest_name
+
+
+def shard_index(object_id: str, shard_count: int, boundaries: list[int]) -> int:
+    """
+    Return the index of the shard, out of shard_count shards, holding object_id. If boundaries is empty, the shards
+    were split by hash. Otherwise they were split by range, and boundaries are the smallest id numbers in each shard
+    after the first.
+
+    >>> shard_index('nm0000138', 4, []) == shard_index('nm0000138', 4, [])
+    True
+    >>> shard_index('tt0000120', 3, [100, 200])
+    1
+    """
+    if len(boundaries) == 0:
+        return zlib.crc32(object_id.encode('UTF-8')) % shard_count
+    return bisect_right(boundaries, id_number(object_id))
+
+
+def id_number(object_id: str) -> int:
+    """
+    Return the number of an IMDb id, or 0 if it has none
+
+    >>> id_number('nm0000138')
+    138
+    """
+    number = re.search(r'\d+', object_id)
+    return 0 if number is None else int(number.group())
+
+
+def year_value(year: int | str | None) -> int | None:
+    """
+    Return year as an int, or None if it is unknown. Years are ints, or NULL if unknown, once the database is migrated
+    by migrate_typed_schema, but strings, or '\\N' if unknown, before.
+
+    >>> [year_value('1999'), year_value(1999), year_value('\\\\N'), year_value(None)]
+    [1999, 1999, None, None]
+    """
+    if isinstance(year, int):
+        return year
+    elif isinstance(year, str) and year.isnumeric():
+        return int(year)
+    else:
+        return None
+
+
+def is_typed_schema(connection: sql.Connection) -> bool:
+    """
+    Return whether the graph database connected to by connection was migrated by migrate_typed_schema
+    """
+    return any(column[1] == 'deathYear' and column[2] == 'INTEGER'
+               for column in connection.execute("""PRAGMA table_info(actor)"""))
+
+
+def _insert_rows(connection: sql.Connection, table_name: str, rows: list[tuple]) -> None:
+    """
+    Insert rows into the table called table_name of the database connected to by connection
+    """
+    if len(rows) > 0:
+        connection.executemany(f"""INSERT OR IGNORE INTO "{table_name}" VALUES({', '.join('?' * len(rows[0]))})""",
+                               rows)
+
+
+def _get_cast(cursor: sql.Cursor, casts: OrderedDict[str, list[str]], movie_id: str) -> list[str]:
+    """
+    Return the ids of the actors in the movie with movie_id, using the edge table cursor is on. The casts looked up
+    most recently are kept in casts, which is never let grow past CAST_CACHE_SIZE movies.
+    """
+    if movie_id in casts:
+        casts.move_to_end(movie_id)
+        return casts[movie_id]
+
+    actors = cursor.execute("""SELECT connections FROM edge WHERE object_id = ?""", (movie_id,)).fetchone()
+    cast = [] if actors is None else [actor_id for actor_id in actors[0].split(',') if actor_id != '']
+
+    casts[movie_id] = cast
+    if len(casts) > CAST_CACHE_SIZE:
+        casts.popitem(last=False)
+    return cast
+
+
+@profiling.profiled
+def optimize_for_serving(database_name: str) -> str:
+    """
+    Prepares the graph database at database_name to be served read only, as ShortestActorGraph does with read_only.
+    This only has to be done once, after the database is finished being built.
+
+    Every table with a primary key is rebuilt as a WITHOUT ROWID table, so its rows are stored in order of their ids
+    and looking one up takes a single search instead of an index search then a table search. Indexes made redundant by
+    this are dropped. Then the query planner's statistics are gathered with ANALYZE, and the file is compacted with
+    VACUUM.
+
+    Returns the name of the database if it was optimized, but an empty string if it could not be found.
+    """
+    if not os.path.exists(database_name):
+        return ''
+
+    connection = profiling.trace(sql.connect(database_name))
+    cursor = connection.cursor()
+
+    tables = cursor.execute("""SELECT name, sql FROM sqlite_master
+            WHERE type = 'table' AND name NOT LIKE 'sqlite_%'""").fetchall()
+
+    for table_name, table_sql in tables:
+        columns = cursor.execute(f"""PRAGMA table_info("{table_name}")""").fetchall()
+        primary_keys = [column[1] for column in columns if column[5] > 0]
+        if 'WITHOUT ROWID' in table_sql.upper() or len(primary_keys) != 1:
+            continue
+
+        kept_indexes = []
+        for index_name, index_sql in cursor.execute("""SELECT name, sql FROM sqlite_master
+                WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL""", (table_name,)).fetchall():
+            index_columns = [column[2] for column in cursor.execute(f"""PRAGMA index_info("{index_name}")""")]
+            if index_columns != primary_keys:
+                kept_indexes.append(index_sql)
+
+        column_definitions = ', '.join(f'"{column[1]}" {column[2]}'.strip() + (' PRIMARY KEY' if column[5] else '')
+                                       for column in columns)
+        cursor.execute(f"""CREATE TABLE "{table_name}_serving"({column_definitions}) WITHOUT ROWID""")
+        cursor.execute(f"""INSERT OR IGNORE INTO "{table_name}_serving" SELECT * FROM "{table_name}"
+                WHERE "{primary_keys[0]}" IS NOT NULL""")
+        cursor.execute(f"""DROP TABLE "{table_name}" """)
+        cursor.execute(f"""ALTER TABLE "{table_name}_serving" RENAME TO "{table_name}" """)
+
+        for index_sql in kept_indexes:
+            cursor.execute(index_sql)
+        connection.commit()
+
+    cursor.execute("""ANALYZE""")
+    connection.commit()
+    cursor.execute("""VACUUM""")
+
+    cursor.close()
+    connection.close()
+    return database_name
+
+
+@profiling.profiled
+def migrate_typed_schema(database_name: str) -> str:
+    """
+    Migrates the actor and movie tables of the graph database at database_name to the column types in TYPED_COLUMNS.
+    Years and other numbers become INTEGER columns, with NULL in place of '\\N' and anything else that isn't a number,
+    and the indexes in TYPED_INDEXES are added, so alive and release year restrictions can be answered from an index.
+    The database is then compacted with VACUUM.
+
+    Tables keep their indexes, and stay WITHOUT ROWID if they were. The database can be migrated before or after
+    optimize_for_serving, and ShortestActorGraph reads it either way.
+
+    Returns the name of the database if it was migrated, but an empty string if it could not be found or was already
+    migrated.
+
+    Preconditions:
+        - database_name is a valid database that has at least the tables "actor" and "movie"
+    """
+    if not os.path.exists(database_name):
+        return ''
+
+    connection = profiling.trace(sql.connect(database_name))
+    if is_typed_schema(connection):
+        connection.close()
+        return ''
+    cursor = connection.cursor()
+
+    for table_name, columns in TYPED_COLUMNS.items():
+        table_sql = cursor.execute("""SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?""",
+                                   (table_name,)).fetchone()[0]
+        indexes = [index[0] for index in cursor.execute("""SELECT sql FROM sqlite_master
+                WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL""", (table_name,))]
+
+        column_definitions = ', '.join(f'"{name}" {column_type}' + (' PRIMARY KEY' if name == 'id' else '')
+                                       for name, column_type in columns)
+        values = ', '.join(f'"{name}"' if column_type == 'TEXT' else
+                           f"""CASE WHEN "{name}" GLOB '[0-9]*' AND "{name}" NOT GLOB '*[^0-9]*'
+                                    THEN CAST("{name}" AS INTEGER) END"""
+                           for name, column_type in columns)
+        without_rowid = ' WITHOUT ROWID' if 'WITHOUT ROWID' in table_sql.upper() else ''
+
+        cursor.execute(f"""CREATE TABLE "{table_name}_typed"({column_definitions}){without_rowid}""")
+        cursor.execute(f"""INSERT OR IGNORE INTO "{table_name}_typed" SELECT {values} FROM "{table_name}"
+                WHERE id IS NOT NULL""")
+        cursor.execute(f"""DROP TABLE "{table_name}" """)
+        cursor.execute(f"""ALTER TABLE "{table_name}_typed" RENAME TO "{table_name}" """)
+
+        for index_sql in indexes:
+            cursor.execute(index_sql)
+        connection.commit()
+
+    for index_sql in TYPED_INDEXES:
+        cursor.execute(index_sql)
+    cursor.execute("""ANALYZE""")
+    connection.commit()
+    cursor.execute("""VACUUM""")
+
+    cursor.close()
+    connection.close()
+    return database_name
+
+
 if __name__ == '__main__':
     # import python_ta
     # python_ta.check_all(config={
@@ -325,6 +1013,11 @@ if __name__ == '__main__':
             create_actor_table(inputted_created_database, inputted_main_database)
             print(f"Created a new database for graph traversing at {inputted_created_database}")
 
+            if input("Would you like to add the actor to actor graph for faster searches? (Y/N) "
+                     "(Note this takes a while) ").strip().lower() == 'y':
+                create_costar_table(inputted_created_database)
+                print(f"Added the actor to actor graph to {inputted_created_database}")
+
     # actor_id_to_name_file = input("What will your source of actor IDs to names be? ")
     # movie_id_to_name_file = input("What will your source of movie IDs to titles be? ")
     # actor_played_in_file = input("What will your source of actor to movie relations be? ")
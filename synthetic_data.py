@@ -0,0 +1,203 @@
+"""
+Module Description
+==================
+A file that generates synthetic versions of the IMDb name.basics, title.basics, and title.principals files, at any
+scale. The files have the same columns as the real ones, so they can be given to sql_processing in their place, for
+testing and benchmarking without downloading the real data set.
+
+The data is shaped like the real data set. Titles become more common over the years, cast sizes and career lengths
+follow power laws, and people can only be cast in titles released during their careers. So a few actors with long
+careers are in a great many titles, while most actors are in only one or two.
+
+Everything is generated from a seed, so the same seed and scale always give the same files. People and titles are
+written in order of the year they start, which lets the people active in a given year be found without keeping an
+index of them, so memory use only grows with a few bytes per person.
+
+Copyright and Usage Information
+===============================
+This file is solely provided for the use in grading and review of the named student's
+work by the TAs and Professors of CSC111. All further distribution of this code whether
+as is or modified is firmly prohibited.
+
+This file is Copyright (c) Nabhan Rashid, Danny Tran, and Tai Poole
+"""
+import argparse
+import math
+import os
+import random
+from array import array
+
+# The years the generated titles and careers are spread over
+FIRST_YEAR = 1890
+LAST_YEAR = 2025
+
+# The number of people generated for each title
+PEOPLE_PER_TITLE = 1.0
+
+# The share of people who are actors or actresses, and the share of titles that are movies
+ACTING_SHARE = 0.7
+MOVIE_SHARE = 0.4
+
+# The exponents of the power laws cast sizes and career lengths (in years) are drawn from, and their largest values
+CAST_SIZE_EXPONENT = 1.3
+MAX_CAST_SIZE = 200
+CAREER_EXPONENT = 1.2
+MAX_CAREER = 70
+
+# The number of people tried when looking for someone active in a title's year, before giving up on a cast member
+CAST_ATTEMPTS = 20
+
+OTHER_TITLE_TYPES = ['short', 'tvEpisode', 'tvSeries', 'tvMovie', 'video']
+OTHER_PROFESSIONS = ['director', 'writer', 'producer', 'cinematographer', 'composer']
+GENRES = ['Drama', 'Comedy', 'Action', 'Romance', 'Thriller', 'Horror', 'Documentary', 'Crime', 'Western', 'Family']
+FIRST_NAMES = ['Kevin', 'Meryl', 'Tom', 'Viola', 'Denzel', 'Cate', 'Leonardo', 'Frances', 'Morgan', 'Judi',
+               'Sidney', 'Helen', 'Samuel', 'Julianne', 'Gary', 'Tilda', 'Anthony', 'Olivia', 'Daniel', 'Emma',
+               'Michael', 'Grace']
+LAST_NAMES = ['Bacon', 'Streep', 'Hanks', 'Davis', 'Washington', 'Blanchett', 'Moore', 'Freeman', 'Dench', 'Poitier',
+              'Mirren', 'Jackson', 'Oldman', 'Swinton', 'Hopkins', 'Colman', 'Lewis', 'Stone', 'Caine', 'Kelly',
+              'Courtenay', 'Rashid', 'Tran', 'Poole']
+
+
+def generate_dataset(directory: str, title_count: int, seed: int = 0) -> tuple[str, str, str]:
+    """
+    Generates a synthetic name.basics.tsv, title.basics.tsv, and title.principals.tsv with title_count titles in
+    directory, creating directory if it doesn't exist.
+
+    Returns the paths of the three files, in that order.
+
+    Preconditions:
+        - title_count > 0
+    """
+    os.makedirs(directory, exist_ok=True)
+    actor_file = os.path.join(directory, 'name.basics.tsv')
+    movie_file = os.path.join(directory, 'title.basics.tsv')
+    connection_file = os.path.join(directory, 'title.principals.tsv')
+
+    generator = random.Random(seed)
+    person_count = max(1, int(title_count * PEOPLE_PER_TITLE))
+
+    careers = array('B', (min(MAX_CAREER, int(generator.paretovariate(CAREER_EXPONENT)))
+                          for _ in range(person_count)))
+    is_acting = array('B', (generator.random() < ACTING_SHARE for _ in range(person_count)))
+
+    _write_titles(movie_file, connection_file, generator, title_count, careers, is_acting)
+    _write_people(actor_file, generator, careers, is_acting)
+
+    return actor_file, movie_file, connection_file
+
+
+def year_of(index: int, count: int) -> int:
+    """
+    Return the year the title or person at index, out of count titles or people, starts in. The number of titles or
+    people starting in a year grows steadily over the years.
+
+    >>> year_of(0, 100)
+    1890
+    >>> year_of(25, 100)
+    1957
+    """
+    return FIRST_YEAR + int((LAST_YEAR - FIRST_YEAR) * math.sqrt(index / count))
+
+
+def first_starting_in(year: int, count: int) -> int:
+    """
+    Return the index of the first of count people to start in year or later. This is the inverse of year_of.
+
+    >>> first_starting_in(1957, 100) == 25 and year_of(24, 100) < 1957
+    True
+    """
+    if year <= FIRST_YEAR:
+        return 0
+    index = math.ceil(count * ((year - FIRST_YEAR) / (LAST_YEAR - FIRST_YEAR)) ** 2)
+    while index > 0 and year_of(index - 1, count) >= year:
+        index -= 1
+    while index < count and year_of(index, count) < year:
+        index += 1
+    return min(index, count)
+
+
+def _write_titles(movie_file: str, connection_file: str, generator: random.Random, title_count: int,
+                  careers: array, is_acting: array) -> None:
+    """
+    Write title_count titles to movie_file in the format of title.basics.tsv, and their casts and directors to
+    connection_file in the format of title.principals.tsv
+    """
+    person_count = len(careers)
+
+    with open(movie_file, 'w', encoding='UTF-8') as movies, open(connection_file, 'w', encoding='UTF-8') as casts:
+        movies.write('tconst\ttitleType\tprimaryTitle\toriginalTitle\tisAdult\tstartYear\tendYear\t'
+                     'runtimeMinutes\tgenres\n')
+        casts.write('tconst\tordering\tnconst\tcategory\tjob\tcharacters\n')
+
+        for title_index in range(title_count):
+            title_id = f'tt{title_index + 1:07d}'
+            year = year_of(title_index, title_count)
+            title_type = 'movie' if generator.random() < MOVIE_SHARE else generator.choice(OTHER_TITLE_TYPES)
+            title = f'{generator.choice(LAST_NAMES)} {generator.choice(GENRES)} {title_index + 1}'
+            genres = ','.join(generator.sample(GENRES, generator.randint(1, 3)))
+            movies.write(f'{title_id}\t{title_type}\t{title}\t{title}\t0\t{year}\t\\N\t'
+                         f'{generator.randint(10, 180)}\t{genres}\n')
+
+            first_candidate = first_starting_in(year - MAX_CAREER, person_count)
+            last_candidate = first_starting_in(year + 1, person_count) - 1
+            if last_candidate < first_candidate:
+                continue
+
+            cast_size = min(MAX_CAST_SIZE, int(generator.paretovariate(CAST_SIZE_EXPONENT)))
+            cast = []
+            for _ in range(cast_size * CAST_ATTEMPTS):
+                if len(cast) == cast_size:
+                    break
+                person = generator.randint(first_candidate, last_candidate)
+                if (is_acting[person] and person not in cast
+                        and year_of(person, person_count) + careers[person] >= year):
+                    cast.append(person)
+
+            for ordering, person in enumerate(cast):
+                category = 'actor' if person % 2 == 0 else 'actress'
+                casts.write(f'{title_id}\t{ordering + 1}\tnm{person + 1:07d}\t{category}\t\\N\t'
+                            f'["Character {ordering + 1}"]\n')
+
+            for _ in range(CAST_ATTEMPTS):
+                person = generator.randint(first_candidate, last_candidate)
+                if not is_acting[person]:
+                    casts.write(f'{title_id}\t{len(cast) + 1}\tnm{person + 1:07d}\tdirector\t\\N\t\\N\n')
+                    break
+
+
+def _write_people(actor_file: str, generator: random.Random, careers: array, is_acting: array) -> None:
+    """
+    Write every person to actor_file in the format of name.basics.tsv
+    """
+    person_count = len(careers)
+
+    with open(actor_file, 'w', encoding='UTF-8') as people:
+        people.write('nconst\tprimaryName\tbirthYear\tdeathYear\tprimaryProfession\tknownForTitles\n')
+
+        for person in range(person_count):
+            birth_year = year_of(person, person_count) - generator.randint(16, 40)
+            death_year = birth_year + generator.randint(50, 100)
+            if is_acting[person]:
+                profession = 'actor' if person % 2 == 0 else 'actress'
+                if generator.random() < 0.1:
+                    profession += ',' + generator.choice(OTHER_PROFESSIONS)
+            else:
+                profession = ','.join(generator.sample(OTHER_PROFESSIONS, generator.randint(1, 2)))
+
+            death = str(death_year) if death_year < LAST_YEAR else '\\N'
+
+            people.write(f'nm{person + 1:07d}\t{generator.choice(FIRST_NAMES)} {generator.choice(LAST_NAMES)}\t'
+                         f'{birth_year}\t{death}\t{profession}\t\\N\n')
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic IMDb data set")
+    parser.add_argument('directory', help="the directory to write the three .tsv files to")
+    parser.add_argument('--titles', type=int, default=10000, help="the number of titles to generate")
+    parser.add_argument('--seed', type=int, default=0, help="the seed of the random generator")
+    arguments = parser.parse_args()
+
+    print("Wrote " + ', '.join(generate_dataset(arguments.directory, arguments.titles, arguments.seed)))